@@ -47,9 +47,11 @@ class BondAnnotationDataset(BaseDataset):
 
         self.graphs = []
         self.labels = []
+        num_labels = len(raw_labels)
+        log_progress = logger.isEnabledFor(logging.INFO)
         for i, mol in enumerate(supp):
-            if i % 100 == 0:
-                logger.info("Processing molecule {}/{}".format(i, len(raw_labels)))
+            if log_progress and i % 100 == 0:
+                logger.info("Processing molecule %d/%d", i, num_labels)
 
             # bad mol
             if mol is None:
@@ -3,6 +3,25 @@ import dgl
 import itertools
 from torch.utils.data import DataLoader
 
+# `persistent_workers` of DataLoader is only available from torch 1.7
+_HAS_PERSISTENT_WORKERS = tuple(
+    int(x) for x in torch.__version__.split("+")[0].split(".")[:2]
+) >= (1, 7)
+
+
+def _with_persistent_workers(kwargs):
+    """
+    Keep the worker processes of multiprocess loading alive across epochs, instead
+    of starting them (and copying the dataset to them) again every epoch. An
+    explicit `persistent_workers` is respected; with torch < 1.7, which does not
+    support it, kwargs are returned unchanged.
+    """
+    if _HAS_PERSISTENT_WORKERS and kwargs.get("num_workers", 0) > 0:
+        kwargs = dict(kwargs)
+        kwargs.setdefault("persistent_workers", True)
+    return kwargs
+
+
 """
 class DataLoader(DataLoader):
 
@@ -54,7 +73,9 @@ class DataLoaderGraphNorm(DataLoader):
 
             return batched_graphs, batched_labels
 
-        super(DataLoaderGraphNorm, self).__init__(dataset, collate_fn=collate, **kwargs)
+        super(DataLoaderGraphNorm, self).__init__(
+            dataset, collate_fn=collate, **_with_persistent_workers(kwargs)
+        )
 
 
 class DataLoaderBond(DataLoader):
@@ -104,7 +125,9 @@ class DataLoaderBond(DataLoader):
 
             return batched_graphs, batched_labels
 
-        super(DataLoaderBond, self).__init__(dataset, collate_fn=collate, **kwargs)
+        super(DataLoaderBond, self).__init__(
+            dataset, collate_fn=collate, **_with_persistent_workers(kwargs)
+        )
 
 
 class DataLoaderReaction(DataLoader):
@@ -157,7 +180,9 @@ class DataLoaderReaction(DataLoader):
 
             return batched_graphs, batched_labels
 
-        super(DataLoaderReaction, self).__init__(dataset, collate_fn=collate, **kwargs)
+        super(DataLoaderReaction, self).__init__(
+            dataset, collate_fn=collate, **_with_persistent_workers(kwargs)
+        )
 
 
 class DataLoaderReactionNetwork(DataLoader):
@@ -215,7 +240,7 @@ class DataLoaderReactionNetwork(DataLoader):
             return batched_graphs, batched_labels
 
         super(DataLoaderReactionNetwork, self).__init__(
-            dataset, collate_fn=collate, **kwargs
+            dataset, collate_fn=collate, **_with_persistent_workers(kwargs)
         )
 
 
@@ -311,7 +336,7 @@ class DataLoaderPrecomputedReactionGraphs(DataLoader):
             return batched_graphs, batched_labels
 
         super(DataLoaderPrecomputedReactionGraphs, self).__init__(
-            dataset, collate_fn=collate, **kwargs
+            dataset, collate_fn=collate, **_with_persistent_workers(kwargs)
         )
 
 
@@ -322,7 +347,7 @@ class DataLoaderPrecomputedReactionGraphsParallel(DataLoader):
 
     def __init__(self, dataset, **kwargs):
         super(DataLoaderPrecomputedReactionGraphsParallel, self).__init__(
-            dataset, **kwargs
+            dataset, **_with_persistent_workers(kwargs)
         )
 
 
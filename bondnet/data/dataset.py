@@ -1,22 +1,49 @@
-import torch, itertools
+import torch, itertools, os, hashlib
+import dgl
+import torch.nn.functional as F
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from functools import partial
 from collections import defaultdict, OrderedDict
-from concurrent.futures import TimeoutError
+from concurrent.futures import TimeoutError, ProcessPoolExecutor
 from tqdm import tqdm
 from rdkit import Chem, RDLogger
 
 from bondnet.dataset.generalized import create_reaction_network_files_and_valid_rows
 from bondnet.data.reaction_network import ReactionInNetwork, ReactionNetwork
-from bondnet.data.transformers import HeteroGraphFeatureStandardScaler, StandardScaler
+from bondnet.data.transformers import HeteroGraphFeatureStandardScaler
 from bondnet.data.utils import get_dataset_species, get_hydro_data_functional_groups
-from bondnet.utils import to_path, yaml_load, list_split_by_size
-from bondnet.data.utils import create_rxn_graph
+from bondnet.utils import to_path, yaml_load, yaml_load_parallel, list_split_by_size
+from bondnet.data.utils import (
+    create_rxn_graph,
+    get_has_bonds,
+    species_from_mask,
+    species_mask_of_mol,
+)
 
 logger = RDLogger.logger()
 logger.setLevel(RDLogger.CRITICAL)
 
+# species of the reaction network datasets, hard coded to have a fixed size and order
+# of the species one-hot features; this potentially needs to be adjusted for other
+# datasets
+DATASET_SPECIES = ("C", "F", "H", "N", "O", "Mg", "Li", "S", "Cl", "P", "Br")
+assert len(set(DATASET_SPECIES)) == len(DATASET_SPECIES), "duplicate species"
+
+
+def _check_state_dict_species(species):
+    """
+    Check species read from a state dict match `DATASET_SPECIES`. State dicts written
+    before the duplicated `O` was removed from the species have features of a
+    different size and cannot be reused.
+    """
+    if species is not None and list(species) != list(DATASET_SPECIES):
+        raise ValueError(
+            f"Species {list(species)} in the state dict do not match the dataset "
+            f"species {list(DATASET_SPECIES)}. Regenerate the state dict."
+        )
+
 
 def task_done(future):
     try:
@@ -28,6 +55,353 @@ def task_done(future):
         print(error.traceback)  # traceback of the function
 
 
+def _num_graph_workers():
+    """
+    Default number of processes used to build graphs when a dataset is not given
+    `num_workers`, read from the environment variable `BONDNET_GRAPH_WORKERS`.
+    Defaults to the number of cpus.
+    """
+    return int(os.environ.get("BONDNET_GRAPH_WORKERS", os.cpu_count() or 1))
+
+
+def _build_graph(grapher, species, args):
+    i, mol, feats = args
+    if mol is None:
+        return i, None
+    g = grapher.build_graph_and_featurize(
+        mol, extra_feats_info=feats, dataset_species=species
+    )
+    # add this for check purpose; some entries in the sdf file may fail
+    g.graph_id = i
+    return i, g
+
+
+# grapher and species of a graph building worker, set once by `_init_graph_worker`
+# instead of being pickled with every task
+_worker_build_graph = None
+
+
+def _init_graph_worker(grapher, species):
+    # one torch thread per worker, the workers already use all the cores
+    torch.set_num_threads(1)
+
+    global _worker_build_graph
+    _worker_build_graph = partial(_build_graph, grapher, species)
+
+
+def _graph_to_payload(g):
+    """
+    Structure, features and attributes of a graph as numpy arrays and plain python
+    objects. Tensors sent between processes are shared through a file descriptor
+    each, which runs out of descriptors for large datasets; numpy arrays are pickled
+    by value.
+    """
+    etypes = g.canonical_etypes
+    edges = {et: tuple(x.numpy() for x in g.edges(etype=et)) for et in etypes}
+    num_nodes = {nt: g.number_of_nodes(nt) for nt in g.ntypes}
+    ndata = {nt: {k: v.numpy() for k, v in g.nodes[nt].data.items()} for nt in g.ntypes}
+    edata = {et: {k: v.numpy() for k, v in g.edges[et].data.items()} for et in etypes}
+    # attributes set by the grapher, e.g. `mol_name`; those of dgl are private
+    attrs = {k: v for k, v in vars(g).items() if not k.startswith("_")}
+    return edges, num_nodes, ndata, edata, attrs
+
+
+def _graph_from_payload(payload):
+    edges, num_nodes, ndata, edata, attrs = payload
+    g = dgl.heterograph(
+        {et: tuple(torch.from_numpy(x) for x in uv) for et, uv in edges.items()},
+        num_nodes_dict=num_nodes,
+    )
+    for nt, data in ndata.items():
+        g.nodes[nt].data.update({k: torch.from_numpy(v) for k, v in data.items()})
+    for et, data in edata.items():
+        g.edges[et].data.update({k: torch.from_numpy(v) for k, v in data.items()})
+    for k, v in attrs.items():
+        setattr(g, k, v)
+    return g
+
+
+def _build_graph_in_worker(args):
+    # the graph is sent back as a payload and rebuilt in the parent
+    i, g = _worker_build_graph(args)
+    return i, _graph_to_payload(g) if g is not None else None
+
+
+def build_graphs_parallel(
+    grapher, molecules, features, species, num_workers=None, chunksize=None
+):
+    """
+    Build DGL graphs using grapher for the molecules, distributing the molecules over
+    a pool of processes.
+
+    The first valid molecule is always featurized in the current process, such that
+    the feature name and size of the featurizers of `grapher` get initialized.
+
+    Args:
+        grapher (Grapher): grapher object to create DGL graphs
+        molecules (list): molecules to featurize
+        features (list): each element is a dict of extra features for a molecule
+        species (list): chemical species (str) in all molecules
+        num_workers (int): number of processes. If `None`, determined by
+            `BONDNET_GRAPH_WORKERS`, falling back to the number of cpus. If `1`,
+            graphs are built serially.
+        chunksize (int): number of molecules sent to a worker at a time. If `None`,
+            the molecules are split in about 4 chunks per worker.
+
+    Returns:
+        list: DGL graphs, `None` for molecules that are `None`
+    """
+    if num_workers is None:
+        num_workers = _num_graph_workers()
+
+    graphs = [None] * len(molecules)
+
+    # failed molecules are filtered out upfront, such that they are neither sent to
+    # the workers nor featurized
+    jobs = [
+        (i, mol, feats)
+        for i, (mol, feats) in enumerate(zip(molecules, features))
+        if mol is not None
+    ]
+    if not jobs:
+        return graphs
+
+    # featurize the first valid molecule here to initialize feature name and size
+    i, g = _build_graph(grapher, species, jobs[0])
+    graphs[i] = g
+
+    rest = jobs[1:]
+    # too few molecules to be worth starting a pool
+    if num_workers <= 1 or len(rest) < 128:
+        build = partial(_build_graph, grapher, species)
+        for i, g in tqdm(map(build, rest), total=len(rest)):
+            graphs[i] = g
+    else:
+        if chunksize is None:
+            chunksize = max(1, len(rest) // (4 * num_workers))
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_graph_worker,
+            initargs=(grapher, species),
+        ) as executor:
+            results = executor.map(_build_graph_in_worker, rest, chunksize=chunksize)
+            for i, payload in tqdm(results, total=len(rest)):
+                if payload is not None:
+                    graphs[i] = _graph_from_payload(payload)
+
+    return graphs
+
+
+# custom attributes set on the graphs by the grapher, not kept by `dgl.save_graphs`
+_GRAPH_ATTRS = ("graph_id", "mol_name", "atom_ind", "bond_ind")
+
+# featurizer attributes set from the featurized data or derived from the others,
+# left out of the featurizer signature
+_FEATURIZER_DERIVED_ATTRS = ("_feature_size", "_feature_name", "_np_dtype")
+
+
+def graphs_to_device(graphs, device):
+    """
+    Move graphs to device with a single copy, by batching them, moving the batched
+    graph and then unbatching it, instead of copying the graphs one by one.
+
+    Args:
+        graphs (list): DGL graphs, `None` entries are kept as is
+        device (torch.device): device to move the graphs to
+
+    Returns:
+        list: DGL graphs on device
+    """
+    valid = [g for g in graphs if g is not None]
+    if not valid:
+        return graphs
+
+    device = torch.device(device)
+    batched = dgl.batch(valid)
+    if device.type == "cuda" and batched.device.type == "cpu":
+        # stage in page-locked memory so the copy is one asynchronous bulk transfer
+        batched.pin_memory_()
+        moved = batched.to(device, non_blocking=True)
+        # the host buffer must outlive the copy before it is unpinned
+        torch.cuda.current_stream(device).synchronize()
+        batched.unpin_memory_()
+    else:
+        moved = batched.to(device)
+    moved = iter(dgl.unbatch(moved))
+    rst = []
+    for g in graphs:
+        if g is None:
+            rst.append(None)
+            continue
+        new_g = next(moved)
+        # `dgl.unbatch` does not keep the custom attributes
+        for k in _GRAPH_ATTRS:
+            if hasattr(g, k):
+                setattr(new_g, k, getattr(g, k))
+        rst.append(new_g)
+    return rst
+
+
+def _update_signature_hash(h, obj):
+    """
+    Feed a config value into the hash `h`. Arrays and tensors are hashed by their
+    values, not by their repr, which numpy truncates and rounds; objects (e.g. the
+    length featurizer of a bond featurizer) by their type and attributes, not by
+    their repr, which holds their memory address.
+    """
+    if isinstance(obj, torch.Tensor):
+        obj = obj.detach().cpu().numpy()
+    if isinstance(obj, (np.ndarray, np.generic)):
+        obj = np.ascontiguousarray(obj)
+        h.update(f"array{obj.dtype}{obj.shape}".encode())
+        h.update(obj.tobytes())
+    elif isinstance(obj, dict):
+        h.update(b"{")
+        for k, v in sorted(obj.items(), key=lambda kv: repr(kv[0])):
+            if k in _FEATURIZER_DERIVED_ATTRS:
+                continue
+            h.update(repr(k).encode())
+            _update_signature_hash(h, v)
+        h.update(b"}")
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}[".encode())
+        for v in obj:
+            _update_signature_hash(h, v)
+        h.update(b"]")
+    elif isinstance(obj, (set, frozenset)):
+        h.update(repr(sorted(repr(v) for v in obj)).encode())
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        h.update(type(obj).__name__.encode())
+        _update_signature_hash(h, vars(obj))
+    else:
+        h.update(repr(obj).encode())
+
+
+def _grapher_signature(grapher):
+    """
+    A string describing the configuration of the grapher and its featurizers, used
+    to key on-disk caches of featurized graphs.
+    """
+    parts = [type(grapher).__name__, str(grapher.self_loop)]
+    for name in ["atom_featurizer", "bond_featurizer", "global_featurizer"]:
+        featurizer = getattr(grapher, name, None)
+        if featurizer is None:
+            parts.append("None")
+            continue
+        h = hashlib.sha1()
+        _update_signature_hash(h, featurizer)
+        parts.append(f"{type(featurizer).__name__}:{h.hexdigest()}")
+    return "|".join(parts)
+
+
+def save_graphs_cache(filename, graphs, meta):
+    """
+    Save featurized graphs with `dgl.save_graphs` and other info with `torch.save`.
+
+    Graphs that are `None` (failed molecules) and the custom graph attributes in
+    `_GRAPH_ATTRS` are recorded in the metadata, since DGL does not store them.
+
+    Args:
+        filename (Path): path of the metadata file; graphs are written to the same
+            path with suffix `.bin`.
+        graphs (list): DGL graphs, `None` for failed molecules
+        meta (dict): other info to store, e.g. labels and species
+    """
+    valid = [g for g in graphs if g is not None]
+    attrs = [{k: getattr(g, k) for k in _GRAPH_ATTRS if hasattr(g, k)} for g in valid]
+    dgl.save_graphs(str(filename.with_suffix(".bin")), valid)
+    meta = dict(meta, graph_attrs=attrs, is_none=[g is None for g in graphs])
+    torch.save(meta, str(filename))
+
+
+def load_graphs_cache(filename, meta):
+    """
+    Load graphs saved by `save_graphs_cache`.
+
+    Args:
+        filename (Path): path of the metadata file
+        meta (dict): metadata loaded from `filename` with `torch.load`
+
+    Returns:
+        list: DGL graphs, `None` for failed molecules
+    """
+    valid, _ = dgl.load_graphs(str(filename.with_suffix(".bin")))
+    for g, attrs in zip(valid, meta["graph_attrs"]):
+        for k, v in attrs.items():
+            setattr(g, k, v)
+    valid = iter(valid)
+    return [None if is_none else next(valid) for is_none in meta["is_none"]]
+
+
+class ReactionLabels:
+    """
+    Labels of reactions stored column-wise: the values are kept in contiguous tensors
+    and the other label fields in lists. The dict of a label, as consumed by the
+    collate functions, is only built when the label is indexed.
+
+    The standardization mean and std (if any) are stored once for all labels.
+
+    Args:
+        values (Tensor): label values, the first dimension indexes the reactions
+        values_rev (Tensor or list or None): label values of the reverse reactions,
+            `None` if the labels have no reverse values
+        fields (dict): other label fields (e.g. `id`, `atom_map`), each a list with
+            the same length as `values`
+    """
+
+    __slots__ = ("values", "values_rev", "fields", "scaler_mean", "scaler_stdev")
+
+    def __init__(self, values, values_rev, fields):
+        self.values = values
+        self.values_rev = values_rev
+        self.fields = dict(fields)
+        self.scaler_mean = None
+        self.scaler_stdev = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, item):
+        if not -len(self) <= item < len(self):
+            raise IndexError(f"label index {item} out of range")
+        lb = {"value": self.values[item]}
+        if self.values_rev is not None:
+            lb["value_rev"] = self.values_rev[item]
+        for k, v in self.fields.items():
+            lb[k] = v[item]
+        if self.scaler_mean is not None:
+            lb["scaler_mean"] = self.scaler_mean
+            lb["scaler_stdev"] = self.scaler_stdev
+        return lb
+
+
+def _one_hot_classes(values, values_rev, num_categories):
+    """
+    One-hot encode the classes of the reactions of a classification dataset.
+
+    The class of a reverse reaction is marked in the tensor of the forward reaction,
+    and the reverse reaction gets an all-zero tensor.
+
+    Args:
+        values (list): class (int) of each reaction
+        values_rev (list): class (int) of each reverse reaction, `None` if a reaction
+            has no reverse one
+        num_categories (int): number of classes
+
+    Returns:
+        tuple: (values, values_rev), a 2D tensor with a row for each reaction and a
+        list of 1D tensors (or `None`)
+    """
+    values = F.one_hot(torch.tensor(values, dtype=torch.long), num_categories).float()
+    has_rev = [i for i, v in enumerate(values_rev) if v is not None]
+    rev = torch.tensor([values_rev[i] for i in has_rev], dtype=torch.long)
+    values[torch.tensor(has_rev, dtype=torch.long), rev] = 1
+    values_rev = [None] * len(values_rev)
+    for i in has_rev:
+        values_rev[i] = torch.zeros(num_categories)
+    return values, values_rev
+
+
 class BaseDataset:
     """
      Base dataset class.
@@ -59,6 +433,16 @@ class BaseDataset:
      state_dict_filename (str or None): If `None`, feature mean and std (if
          feature_transformer is True) and label mean and std (if label_transformer is True)
          are computed from the dataset; otherwise, they are read from the file.
+     cache_yaml (bool): If `True`, label and feature yaml files are cached as pickles
+         next to them and read from there by later runs, see
+         `bondnet.utils.yaml_load`.
+     num_workers (int or None): number of processes used to build the graphs. If
+         `None`, the environment variable `BONDNET_GRAPH_WORKERS` is used, and the
+         number of cpus if it is not set. For more than 128 molecules and more than
+         one worker, the graphs are built in a process pool; on platforms that start
+         processes by spawning (Windows, macOS), the script creating the dataset then
+         needs an `if __name__ == "__main__":` guard. Set to `1` to build the graphs
+         in the current process.
     """
 
     def __init__(
@@ -71,6 +455,8 @@ class BaseDataset:
         label_transformer=True,
         dtype="float32",
         state_dict_filename=None,
+        cache_yaml=False,
+        num_workers=None,
     ):
         if dtype not in ["float32", "float64"]:
             raise ValueError(f"`dtype {dtype}` should be `float32` or `float64`.")
@@ -79,10 +465,14 @@ class BaseDataset:
         self.molecules = (
             to_path(molecules) if isinstance(molecules, (str, Path)) else molecules
         )
-        try:
+        # convert molecule wrappers to rdkit molecules; rdkit molecules and paths to
+        # sdf files are kept as is
+        if (
+            isinstance(self.molecules, (list, tuple))
+            and len(self.molecules) > 0
+            and hasattr(self.molecules[0], "rdkit_mol")
+        ):
             self.molecules = [mol.rdkit_mol() for mol in self.molecules]
-        except:
-            print("molecules already some rdkit object")
 
         self.raw_labels = to_path(labels) if isinstance(labels, (str, Path)) else labels
         self.extra_features = (
@@ -94,6 +484,8 @@ class BaseDataset:
         self.label_transformer = label_transformer
         self.dtype = dtype
         self.state_dict_filename = state_dict_filename
+        self.cache_yaml = cache_yaml
+        self.num_workers = num_workers
 
         self.graphs = None
         self.labels = None
@@ -122,6 +514,13 @@ class BaseDataset:
         """
         return self._feature_name
 
+    @property
+    def species(self):
+        """
+        Returns a list of the chemical species (str) of the species features.
+        """
+        return self._species
+
     def get_feature_size(self, ntypes):
         """
         Get feature sizes.
@@ -132,11 +531,19 @@ class BaseDataset:
         Returns:
              list: sizes of features corresponding to note types in `ntypes`.
         """
+        # sizes matched for each node type, reset when the feature size changes
+        feature_size = self.feature_size
+        cache = getattr(self, "_feature_size_by_ntype", None)
+        if cache is None or cache[0] is not feature_size:
+            cache = (feature_size, {})
+            self._feature_size_by_ntype = cache
+        by_ntype = cache[1]
+
         size = []
         for nt in ntypes:
-            for k in self.feature_size:
-                if nt in k:
-                    size.append(self.feature_size[k])
+            if nt not in by_ntype:
+                by_ntype[nt] = [v for k, v in feature_size.items() if nt in k]
+            size.extend(by_ntype[nt])
         # TODO more checks needed e.g. one node get more than one size
         msg = f"cannot get feature size for nodes: {ntypes}"
         assert len(ntypes) == len(size), msg
@@ -156,6 +563,18 @@ class BaseDataset:
         """
         return self._failed
 
+    def label_ids(self):
+        """
+        Ids of the labels, in the order of the data points. Unlike iterating over the
+        dataset, this does not build the data points (graphs, features).
+
+        Returns:
+            list: the `id` of each label
+        """
+        if isinstance(self.labels, ReactionLabels):
+            return list(self.labels.fields["id"])
+        return [lb["id"] for lb in self.labels]
+
     def state_dict(self):
         d = {
             "feature_size": self._feature_size,
@@ -191,7 +610,46 @@ class BaseDataset:
         return molecules
 
     @staticmethod
-    def build_graphs(grapher, molecules, features, species):
+    def get_molecules_and_species(molecules):
+        """
+        Get the molecules and the species in them. If `molecules` is the path to an
+        sdf file, the species are collected while reading it, instead of in another
+        pass over the molecules.
+
+        Returns:
+            tuple: (molecules, species), species being a sorted list of str
+        """
+        if not isinstance(molecules, Path):
+            species = get_dataset_species(molecules)
+            return molecules, species
+
+        supp = Chem.SDMolSupplier(str(molecules), sanitize=True, removeHs=False)
+        molecules = []
+        species = species_mask_of_mol(None)
+        for m in supp:
+            molecules.append(m)
+            if m is not None:
+                species |= species_mask_of_mol(m)
+        return molecules, species_from_mask(species)
+
+    def get_labels_and_features(self):
+        """
+        Get the raw labels and the extra features (`None` if not provided). Label and
+        feature files are parsed in parallel.
+
+        Returns:
+            tuple: (labels, features)
+        """
+        sources = [self.raw_labels, self.extra_features]
+        paths = [x for x in sources if isinstance(x, Path)]
+        loaded = dict(zip(paths, yaml_load_parallel(paths, cache=self.cache_yaml)))
+        labels, features = [
+            loaded[x] if isinstance(x, Path) else x for x in sources
+        ]
+        return labels, features
+
+    @staticmethod
+    def build_graphs(grapher, molecules, features, species, num_workers=None):
         """
         Build DGL graphs using grapher for the molecules.
 
@@ -200,43 +658,15 @@ class BaseDataset:
             molecules (list): rdkit molecules
             features (list): each element is a dict of extra features for a molecule
             species (list): chemical species (str) in all molecules
+            num_workers (int): number of processes to build the graphs with. If
+                `None`, see :func:`build_graphs_parallel`.
 
         Returns:
             list: DGL graphs
         """
-        graphs = []
-        """
-        with ProcessPool(max_workers=12, max_tasks=10) as pool:
-            for i, (m, feats) in enumerate(zip(molecules, features)):
-                if m is not None:
-                    future = pool.schedule(grapher.build_graph_and_featurize, 
-                                            args=[m], timeout=30,
-                                            kwargs={"extra_feats_info":feats, 
-                                                    "dataset_species":species}
-                                            )
-                    future.add_done_callback(task_done)
-                    try:
-                        g = future.result()
-                        g.graph_id = i
-                        graphs.append(g)
-                    except:
-                        pass
-                else: graphs.append(None)
-
-        """
-        for i, (m, feats) in tqdm(enumerate(zip(molecules, features))):
-            if m is not None:
-                g = grapher.build_graph_and_featurize(
-                    m, extra_feats_info=feats, dataset_species=species
-                )
-                # add this for check purpose; some entries in the sdf file may fail
-                g.graph_id = i
-
-            else:
-                g = None
-            graphs.append(g)
-
-        return graphs
+        return build_graphs_parallel(
+            grapher, molecules, features, species, num_workers=num_workers
+        )
 
     def __getitem__(self, item):
         """Get data point with index
@@ -274,6 +704,13 @@ class BaseDataset:
         return rst
 
 
+# properties supported by MoleculeDataset, in the order of the columns of the label
+# file, with their unit conversion factor and whether they are extensive
+_MOLECULE_PROPERTIES = OrderedDict()
+_MOLECULE_PROPERTIES["atomization_energy"] = {"uc": 1.0, "extensive": True}
+_MOLECULE_PROPERTY_INDEX = {p: i for i, p in enumerate(_MOLECULE_PROPERTIES)}
+
+
 class MoleculeDataset(BaseDataset):
     def __init__(
         self,
@@ -286,9 +723,12 @@ class MoleculeDataset(BaseDataset):
         properties=["atomization_energy"],
         unit_conversion=True,
         dtype="float32",
+        cache_graphs=False,
+        num_workers=None,
     ):
         self.properties = properties
         self.unit_conversion = unit_conversion
+        self.cache_graphs = cache_graphs
         super(MoleculeDataset, self).__init__(
             grapher=grapher,
             molecules=molecules,
@@ -297,11 +737,16 @@ class MoleculeDataset(BaseDataset):
             feature_transformer=feature_transformer,
             label_transformer=label_transformer,
             dtype=dtype,
+            num_workers=num_workers,
         )
 
     def _load(self):
         logger.info("Start loading dataset")
 
+        if self._load_cache():
+            logger.info("Loaded {} graphs from cache".format(len(self.graphs)))
+            return
+
         # read label and feature file
         raw_labels, extensive = self._read_label_file()
         if self.extra_features is not None:
@@ -310,33 +755,28 @@ class MoleculeDataset(BaseDataset):
             features = [None] * len(raw_labels)
 
         # build graph for mols from sdf file
-        molecules = self.get_molecules(self.molecules)
-        species = get_dataset_species(molecules)
+        molecules, species = self.get_molecules_and_species(self.molecules)
+
+        # featurization is independent for each molecule, done in parallel
+        graphs = self.build_graphs(
+            self.grapher, molecules, features, species, num_workers=self.num_workers
+        )
+
+        # labels of all molecules in one tensor, one row for each molecule
+        raw_labels = torch.from_numpy(np.ascontiguousarray(raw_labels, self.dtype))
 
         self.graphs = []
         self.labels = []
-        natoms = []
-        for i, (mol, feats, lb) in enumerate(zip(molecules, features, raw_labels)):
-            if i % 100 == 0:
-                logger.info("Processing molecule {}/{}".format(i, len(raw_labels)))
-
+        for i, (mol, g, lb) in enumerate(zip(molecules, graphs, raw_labels)):
             if mol is None:
                 continue
 
             # graph
-            g = self.grapher.build_graph_and_featurize(
-                mol, extra_feats_info=feats, dataset_species=species
-            )
-            # we add this for check purpose, because some entries in the sdf file may fail
-            g.graph_id = i
             self.graphs.append(g)
 
             # label
-            lb = torch.tensor(lb, dtype=getattr(torch, self.dtype))
             self.labels.append({"value": lb, "id": i})
 
-            natoms.append(mol.GetNumAtoms())
-
         # this should be called after grapher.build_graph_and_featurize,
         # which initializes the feature name and size
         self._feature_name = self.grapher.feature_name
@@ -352,49 +792,35 @@ class MoleculeDataset(BaseDataset):
             logger.info("Feature scaler std: {}".format(feature_scaler.std))
 
         if self.label_transformer:
-            labels = np.asarray([lb["value"].numpy() for lb in self.labels])
-            natoms = np.asarray(natoms, dtype=np.float32)
-
-            scaled_labels = []
-            scaler_mean = []
-            scaler_std = []
-
-            label_scaler_mean = []
-            label_scaler_std = []
-
-            for i, is_ext in enumerate(extensive):
-                if is_ext:
-                    # extensive labels standardized by the number of atoms in the
-                    # molecules, i.e. y' = y/natoms
-                    lb = labels[:, i] / natoms
-                    mean = np.zeros(len(lb))
-                    std = natoms
-                    label_scaler_mean.append(None)
-                    label_scaler_std.append("num atoms")
-                else:
-                    # intensive labels standardized by y' = (y - mean(y))/std(y)
-                    scaler = StandardScaler()
-                    lb = labels[:, [i]]  # 2D array of shape (N, 1)
-                    lb = scaler(lb)
-                    lb = lb.ravel()
-                    mean = np.repeat(scaler.mean, len(lb))
-                    std = np.repeat(scaler.std, len(lb))
-                    label_scaler_mean.append(scaler.mean)
-                    label_scaler_std.append(scaler.std)
-                scaled_labels.append(lb)
-                scaler_mean.append(mean)
-                scaler_std.append(std)
-
-            scaled_labels = torch.tensor(
-                np.asarray(scaled_labels).T, dtype=getattr(torch, self.dtype)
-            )
-            scaler_mean = torch.tensor(
-                np.asarray(scaler_mean).T, dtype=getattr(torch, self.dtype)
-            )
-            scaler_std = torch.tensor(
-                np.asarray(scaler_std).T, dtype=getattr(torch, self.dtype)
+            # rows of the kept molecules, gathered in one indexing op
+            labels = raw_labels[[lb["id"] for lb in self.labels]].numpy()
+            natoms = np.fromiter(
+                (molecules[lb["id"]].GetNumAtoms() for lb in self.labels),
+                dtype=np.float32,
+                count=len(self.labels),
             )
 
+            extensive = np.asarray(extensive, dtype=bool)
+
+            # extensive labels standardized by the number of atoms in the molecules,
+            # i.e. y' = y/natoms; intensive labels standardized by
+            # y' = (y - mean(y))/std(y)
+            mean = np.where(extensive, 0.0, labels.mean(axis=0))
+            std = labels.std(axis=0)
+            scaler_mean = np.broadcast_to(mean, labels.shape)
+            scaler_std = np.where(extensive, natoms[:, None], std)
+            # same as sklearn, constant intensive labels are only centered
+            scale = np.where(extensive, natoms[:, None], np.where(std > 0, std, 1.0))
+            scaled_labels = (labels - scaler_mean) / scale
+
+            label_scaler_mean = [None if e else m for e, m in zip(extensive, mean)]
+            label_scaler_std = ["num atoms" if e else s for e, s in zip(extensive, std)]
+
+            dtype = getattr(np, self.dtype)
+            scaled_labels = torch.from_numpy(np.ascontiguousarray(scaled_labels, dtype))
+            scaler_mean = torch.from_numpy(np.ascontiguousarray(scaler_mean, dtype))
+            scaler_std = torch.from_numpy(np.ascontiguousarray(scaler_std, dtype))
+
             for i, (lb, m, s) in enumerate(zip(scaled_labels, scaler_mean, scaler_std)):
                 self.labels[i]["value"] = lb
                 self.labels[i]["scaler_mean"] = m
@@ -403,8 +829,78 @@ class MoleculeDataset(BaseDataset):
             logger.info("Label scaler mean: {}".format(label_scaler_mean))
             logger.info("Label scaler std: {}".format(label_scaler_std))
 
+        self._species = species
+        self._save_cache()
+
         logger.info("Finish loading {} labels...".format(len(self.labels)))
 
+    @property
+    def _cache_path(self):
+        """
+        Path of the graph cache, next to the sdf file. `None` if caching is disabled
+        or the molecules are not given as a file.
+        """
+        if not self.cache_graphs or not isinstance(self.molecules, Path):
+            return None
+        return self.molecules.with_suffix(".graphs.pt")
+
+    def _cache_hash(self):
+        """
+        Hash of everything the featurized graphs and labels depend on: the grapher
+        config, the dataset options and the input files (path and mtime).
+        """
+        key = [
+            _grapher_signature(self.grapher),
+            self.properties,
+            self.unit_conversion,
+            self.dtype,
+            self.feature_transformer,
+            self.label_transformer,
+        ]
+        for f in [self.molecules, self.raw_labels, self.extra_features]:
+            if isinstance(f, Path):
+                key.append((str(f), os.path.getmtime(f)))
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def _load_cache(self):
+        """
+        Load graphs, labels, species and feature info from the cache if it is valid.
+
+        Returns:
+            bool: whether the cache is loaded
+        """
+        path = self._cache_path
+        if path is None or not path.exists():
+            return False
+
+        meta = torch.load(str(path))
+        if meta["hash"] != self._cache_hash():
+            logger.info("Graph cache {} is outdated, rebuilding".format(path))
+            return False
+
+        graphs = load_graphs_cache(path, meta)
+        self.graphs = [g for g in graphs if g is not None]
+        self.labels = meta["labels"]
+        self._species = meta["species"]
+        self._feature_name = meta["feature_name"]
+        self._feature_size = meta["feature_size"]
+        return True
+
+    def _save_cache(self):
+        path = self._cache_path
+        if path is None:
+            return
+
+        meta = {
+            "hash": self._cache_hash(),
+            "labels": self.labels,
+            "species": self._species,
+            "feature_name": self._feature_name,
+            "feature_size": self._feature_size,
+        }
+        save_graphs_cache(path, self.graphs, meta)
+        logger.info("Saved graph cache to {}".format(path))
+
     def _read_label_file(self):
         """
         Returns:
@@ -415,23 +911,25 @@ class MoleculeDataset(BaseDataset):
                 rst is extensive property or not.
         """
 
-        rst = pd.read_csv(self.raw_labels, index_col=0)
+        # the pyarrow parser is multithreaded and much faster on large label files;
+        # fall back to the default one if pyarrow (or pandas support for it) is missing
+        try:
+            rst = pd.read_csv(self.raw_labels, index_col=0, engine="pyarrow")
+        except (ImportError, ValueError):
+            rst = pd.read_csv(self.raw_labels, index_col=0)
         rst = rst.to_numpy()
 
-        # supported property
-        supp_prop = OrderedDict()
-        supp_prop["atomization_energy"] = {"uc": 1.0, "extensive": True}
+        supp_prop = _MOLECULE_PROPERTIES
 
         if self.properties is not None:
             for prop in self.properties:
                 if prop not in supp_prop:
                     raise ValueError(
                         "Property '{}' not supported. Supported ones are: {}".format(
-                            prop, supp_prop.keys()
+                            prop, list(supp_prop)
                         )
                     )
-            supp_list = list(supp_prop.keys())
-            indices = [supp_list.index(p) for p in self.properties]
+            indices = [_MOLECULE_PROPERTY_INDEX[p] for p in self.properties]
             rst = rst[:, indices]
             convert = [supp_prop[p]["uc"] for p in self.properties]
             extensive = [supp_prop[p]["extensive"] for p in self.properties]
@@ -439,13 +937,24 @@ class MoleculeDataset(BaseDataset):
             convert = [v["uc"] for k, v in supp_prop.items()]
             extensive = [v["extensive"] for k, v in supp_prop.items()]
 
-        if self.unit_conversion:
+        # all supported properties currently have unit conversion 1.0, skip the no-op
+        if self.unit_conversion and any(c != 1.0 for c in convert):
             rst = np.multiply(rst, convert)
 
         return rst, extensive
 
 
 class ReactionNetworkDatasetGraphs(BaseDataset):
+    """
+    Reaction network dataset built from a data file of reactions.
+
+    The molecule graphs are built in a process pool for more than 128 molecules
+    unless `num_workers` (or, if it is `None`, the environment variable
+    `BONDNET_GRAPH_WORKERS`) is `1`. On platforms that start processes by spawning
+    (Windows, macOS), the script creating the dataset then needs an
+    `if __name__ == "__main__":` guard.
+    """
+
     def __init__(
         self,
         grapher,
@@ -465,6 +974,8 @@ class ReactionNetworkDatasetGraphs(BaseDataset):
         extra_keys=None,
         dataset_atom_types=None,
         extra_info=None,
+        cache_yaml=False,
+        num_workers=None,
     ):
         if dtype not in ["float32", "float64"]:
             raise ValueError(f"`dtype {dtype}` should be `float32` or `float64`.")
@@ -495,6 +1006,8 @@ class ReactionNetworkDatasetGraphs(BaseDataset):
         self.label_transformer = label_transformer
         self.dtype = dtype
         self.state_dict_filename = None
+        self.cache_yaml = cache_yaml
+        self.num_workers = num_workers
         self.graphs = None
         self.labels = None
         self.target = target
@@ -518,9 +1031,11 @@ class ReactionNetworkDatasetGraphs(BaseDataset):
 
         # get molecules, labels, and extra features
         molecules = self.get_molecules(self.molecules)
-        raw_labels = self.get_labels(self.raw_labels)
+        raw_labels = self.get_labels(self.raw_labels, cache=self.cache_yaml)
         if self.extra_features is not None:
-            extra_features = self.get_features(self.extra_features)
+            extra_features = self.get_features(
+                self.extra_features, cache=self.cache_yaml
+            )
         else:
             extra_features = [None] * len(molecules)
 
@@ -529,6 +1044,7 @@ class ReactionNetworkDatasetGraphs(BaseDataset):
             logger.info(f"Load dataset state dict from: {self.state_dict_filename}")
             state_dict = torch.load(str(self.state_dict_filename))
             self.load_state_dict(state_dict)
+            _check_state_dict_species(self._species)
 
         # get species
         # species = get_dataset_species_from_json(self.pandas_df)
@@ -539,17 +1055,21 @@ class ReactionNetworkDatasetGraphs(BaseDataset):
 
         # self._species = sorted(system_species)
         # this is hard coded and potentially needs to be adjusted for other datasets, this is to have fixed size and order of the species
-        self._species = ["C", "F", "H", "N", "O", "Mg", "Li", "S", "Cl", "P", "O", "Br"]
+        self._species = list(DATASET_SPECIES)
 
         # create dgl graphs
-        print("constructing graphs & features....")
+        logger.info("Constructing graphs & features")
 
         graphs = self.build_graphs(
-            self.grapher, self.molecules, extra_features, self._species
+            self.grapher,
+            self.molecules,
+            extra_features,
+            self._species,
+            num_workers=self.num_workers,
         )
         graphs_not_none_indices = [i for i, g in enumerate(graphs) if g is not None]
-        print("number of graphs valid: " + str(len(graphs_not_none_indices)))
-        print("number of graphs: " + str(len(graphs)))
+        logger.info(f"Number of valid graphs: {len(graphs_not_none_indices)}")
+        logger.info(f"Number of graphs: {len(graphs)}")
         # store feature name and size
         self._feature_name = self.grapher.feature_name
         self._feature_size = self.grapher.feature_size
@@ -572,21 +1092,13 @@ class ReactionNetworkDatasetGraphs(BaseDataset):
                     mean=self._feature_scaler_mean, std=self._feature_scaler_std
                 )
 
-            graphs_not_none = [graphs[i] for i in graphs_not_none_indices]
-            graphs_not_none = feature_scaler(graphs_not_none)
-            molecules_ordered = [self.molecules[i] for i in graphs_not_none_indices]
-            molecules_final = [0 for i in graphs_not_none_indices]
-            # update graphs
-            for i, g in zip(graphs_not_none_indices, graphs_not_none):
-                molecules_final[i] = molecules_ordered[i]
-                graphs[i] = g
-            self.molecules_ordered = molecules_final
-
+            # move the graphs before scaling, such that the scaler writes the scaled
+            # features directly on device instead of a second pass over them
             if self.device != None:
-                graph_temp = []
-                for g in graphs:
-                    graph_temp.append(g.to(self.device))
-                graphs = graph_temp
+                graphs = graphs_to_device(graphs, self.device)
+
+            # the scaler updates the graphs in place
+            feature_scaler([graphs[i] for i in graphs_not_none_indices])
 
             if self.state_dict_filename is None:
                 self._feature_scaler_mean = feature_scaler.mean
@@ -597,15 +1109,16 @@ class ReactionNetworkDatasetGraphs(BaseDataset):
 
         # create reaction
         reactions = []
-        self.labels = []
+        values = []
+        values_rev = []
+        fields = defaultdict(list)
         self._failed = []
+        valid_set = frozenset(graphs_not_none_indices)
         for i, lb in enumerate(raw_labels):
             mol_ids = lb["reactants"] + lb["products"]
-            for d in mol_ids:
-                # ignore reaction whose reactants or products molecule is None
-                if d not in graphs_not_none_indices:
-                    self._failed.append(True)
-                    break
+            # ignore reaction whose reactants or products molecule is None
+            if not valid_set.issuperset(mol_ids):
+                self._failed.append(True)
             else:
                 rxn = ReactionInNetwork(
                     reactants=lb["reactants"],
@@ -625,60 +1138,47 @@ class ReactionNetworkDatasetGraphs(BaseDataset):
                     environemnt = None
 
                 if self.classifier:
-                    lab_temp = torch.zeros(self.classif_categories)
-                    lab_temp[int(lb["value"][0])] = 1
-
+                    # categories, one-hot encoded after the loop
+                    values.append(int(lb["value"][0]))
                     if lb["value_rev"] != None:
-                        lab_temp_rev = torch.zeros(self.classif_categories)
-                        lab_temp[int(lb["value_rev"][0])] = 1
+                        values_rev.append(int(lb["value_rev"][0]))
                     else:
-                        lab_temp_rev = None
-
-                    label = {
-                        "value": lab_temp,
-                        "value_rev": lab_temp_rev,
-                        "id": lb["id"],
-                        "environment": environemnt,
-                        "atom_map": lb["atom_mapping"],
-                        "bond_map": lb["bond_mapping"],
-                        "total_bonds": lb["total_bonds"],
-                        "total_atoms": lb["total_atoms"],
-                        "reaction_type": lb["reaction_type"],
-                        "extra_info": lb["extra_info"],
-                    }
-                    self.labels.append(label)
+                        values_rev.append(None)
                 else:
-                    label = {
-                        "value": torch.tensor(
-                            lb["value"], dtype=getattr(torch, self.dtype)
-                        ),
-                        "value_rev": torch.tensor(
-                            lb["value_rev"], dtype=getattr(torch, self.dtype)
-                        ),
-                        "id": lb["id"],
-                        "environment": environemnt,
-                        "atom_map": lb["atom_mapping"],
-                        "bond_map": lb["bond_mapping"],
-                        "total_bonds": lb["total_bonds"],
-                        "total_atoms": lb["total_atoms"],
-                        "reaction_type": lb["reaction_type"],
-                        "extra_info": lb["extra_info"],
-                    }
-                    self.labels.append(label)
+                    values.append(lb["value"])
+                    values_rev.append(lb["value_rev"])
+
+                fields["id"].append(lb["id"])
+                fields["environment"].append(environemnt)
+                fields["atom_map"].append(lb["atom_mapping"])
+                fields["bond_map"].append(lb["bond_mapping"])
+                fields["total_bonds"].append(lb["total_bonds"])
+                fields["total_atoms"].append(lb["total_atoms"])
+                fields["reaction_type"].append(lb["reaction_type"])
+                fields["extra_info"].append(lb["extra_info"])
 
                 self._failed.append(False)
 
+        if self.classifier:
+            values, values_rev = _one_hot_classes(
+                values, values_rev, self.classif_categories
+            )
+        else:
+            values = torch.tensor(values, dtype=getattr(torch, self.dtype))
+            values_rev = torch.tensor(values_rev, dtype=getattr(torch, self.dtype))
+        self.labels = ReactionLabels(values, values_rev, fields)
+
         self.reaction_ids = list(range(len(reactions)))
 
         # create reaction network
-        self.reaction_network = ReactionNetwork(graphs, reactions, molecules_final)
+        self.molecules_ordered = [self.molecules[i] for i in graphs_not_none_indices]
+        self.reaction_network = ReactionNetwork(
+            graphs, reactions, self.molecules_ordered
+        )
 
         # feature transformers
         if self.label_transformer:
             # normalization
-            values = torch.stack([lb["value"] for lb in self.labels])  # 1D tensor
-            values_rev = torch.stack([lb["value_rev"] for lb in self.labels])
-
             if self.state_dict_filename is None:
                 mean = torch.mean(values)
                 std = torch.std(values)
@@ -694,15 +1194,12 @@ class ReactionNetworkDatasetGraphs(BaseDataset):
                 mean = self._label_scaler_mean
                 std = self._label_scaler_std
 
-            values = (values - mean) / std
-            value_rev_scaled = (values_rev - mean) / std
-
-            # update label
-            for i, lb in enumerate(values):
-                self.labels[i]["value"] = lb
-                self.labels[i]["scaler_mean"] = mean
-                self.labels[i]["scaler_stdev"] = std
-                self.labels[i]["value_rev"] = value_rev_scaled[i]
+            # standardize both directions in place on one stacked buffer
+            scaled = torch.stack([values, values_rev]).sub_(mean).div_(std)
+            self.labels.values = scaled[0]
+            self.labels.values_rev = scaled[1]
+            self.labels.scaler_mean = mean
+            self.labels.scaler_stdev = std
 
             logger.info(f"Label scaler mean: {mean}")
             logger.info(f"Label scaler std: {std}")
@@ -710,7 +1207,7 @@ class ReactionNetworkDatasetGraphs(BaseDataset):
         logger.info(f"Finish loading {len(self.labels)} reactions...")
 
     @staticmethod
-    def build_graphs(grapher, molecules, features, species):
+    def build_graphs(grapher, molecules, features, species, num_workers=None):
         """
         Build DGL graphs using grapher for the molecules.
 
@@ -719,40 +1216,27 @@ class ReactionNetworkDatasetGraphs(BaseDataset):
             molecules (list): rdkit molecules
             features (list): each element is a dict of extra features for a molecule
             species (list): chemical species (str) in all molecules
+            num_workers (int): number of processes to build the graphs with. If
+                `None`, see :func:`build_graphs_parallel`.
 
         Returns:
             list: DGL graphs
         """
 
-        count = 0
-        graphs = []
-
-        for ind, mol in enumerate(molecules):
-            feats = features[count]
-            if mol is not None:
-                g = grapher.build_graph_and_featurize(
-                    mol, extra_feats_info=feats, dataset_species=species
-                )
-
-                # add this for check purpose; some entries in the sdf file may fail
-                g.graph_id = ind
-            else:
-                g = None
-            graphs.append(g)
-            count += 1
-
-        return graphs
+        return build_graphs_parallel(
+            grapher, molecules, features, species, num_workers=num_workers
+        )
 
     @staticmethod
-    def get_labels(labels):
+    def get_labels(labels, cache=False):
         if isinstance(labels, Path):
-            labels = yaml_load(labels)
+            labels = yaml_load(labels, cache=cache)
         return labels
 
     @staticmethod
-    def get_features(features):
+    def get_features(features, cache=False):
         if isinstance(features, Path):
-            features = yaml_load(features)
+            features = yaml_load(features, cache=cache)
         return features
 
     def __getitem__(self, item):
@@ -762,38 +1246,23 @@ class ReactionNetworkDatasetGraphs(BaseDataset):
     def __len__(self):
         return len(self.reaction_ids)
 
-        return len(self.reaction_ids)
-
 
 class ReactionDataset(BaseDataset):
     def _load(self):
         logger.info("Start loading dataset")
 
         # read label and feature file
-        raw_labels = yaml_load(self.raw_labels)
-        if self.extra_features is not None:
-            features = yaml_load(self.extra_features)
-        else:
+        raw_labels, features = self.get_labels_and_features()
+        if features is None:
             features = [None] * len(raw_labels)
 
         # build graph for mols from sdf file
-        molecules = self.get_molecules(self.molecules)
-        species = get_dataset_species(molecules)
+        molecules, species = self.get_molecules_and_species(self.molecules)
 
-        graphs = []
-        for i, (mol, feats) in enumerate(zip(molecules, features)):
-            if i % 100 == 0:
-                logger.info(f"Processing molecule {i}/{len(raw_labels)}")
-
-            if mol is not None:
-                g = self.grapher.build_graph_and_featurize(
-                    mol, extra_feats_info=feats, dataset_species=species
-                )
-                # add this for check purpose; some entries in the sdf file may fail
-                g.graph_id = i
-            else:
-                g = None
-            graphs.append(g)
+        # featurization is independent for each molecule, done in parallel
+        graphs = self.build_graphs(
+            self.grapher, molecules, features, species, num_workers=self.num_workers
+        )
 
         # Should after grapher.build_graph_and_featurize, which initializes the
         # feature name and size
@@ -814,35 +1283,36 @@ class ReactionDataset(BaseDataset):
         self.labels = []
         for rxn, lb, gmp in zip(reactions, raw_labels, global_mapping):
             if None not in rxn:
-                lb["value"] = torch.tensor(
-                    lb["value"], dztype=getattr(torch, self.dtype)
-                )
                 lb["global_mapping"] = gmp
                 self.graphs.append(rxn)
                 self.labels.append(lb)
 
+        # values of all reactions as one tensor, each label holds a view into it
+        torch_dtype = getattr(torch, self.dtype)
+        values = torch.from_numpy(
+            np.asarray([lb["value"] for lb in self.labels], dtype=self.dtype)
+        )
+        for lb, v in zip(self.labels, values):
+            lb["value"] = v
+
         # transformers
         if self.feature_transformer:
-            graphs = list(
-                itertools.chain.from_iterable(self.graphs)
-            )  # flatten the list
+            # the scaler updates the graphs in place, so the reactions need not be
+            # flattened and regrouped
             feature_scaler = HeteroGraphFeatureStandardScaler()
-            graphs = feature_scaler(graphs)
-            num_mols = [len(rxn) for rxn in self.graphs]
-            self.graphs = list_split_by_size(graphs, num_mols)
+            feature_scaler(itertools.chain.from_iterable(self.graphs))
             logger.info("Feature scaler mean: {}".format(feature_scaler.mean))
             logger.info("Feature scaler std: {}".format(feature_scaler.std))
 
         if self.label_transformer:
             # normalization
-            values = [lb["value"] for lb in self.labels]  # list of 0D tensor
             # np and torch compute slightly differently std (depending on `ddof` of np)
             # here we choose to use np
-            mean = float(np.mean(values))
-            std = float(np.std(values))
-            values = (torch.stack(values) - mean) / std
-            std = torch.tensor(std, dtype=getattr(torch, self.dtype))
-            mean = torch.tensor(mean, dtype=getattr(torch, self.dtype))
+            mean = float(np.mean(values.numpy()))
+            std = float(np.std(values.numpy()))
+            values = (values - mean) / std
+            std = torch.tensor(std, dtype=torch_dtype)
+            mean = torch.tensor(mean, dtype=torch_dtype)
 
             # update label
             for i, lb in enumerate(values):
@@ -866,10 +1336,8 @@ class ReactionNetworkDataset(BaseDataset):
             molecules = [mol.rdkit_mol for mol in molecules]
         except:
             pass
-        raw_labels = self.get_labels(self.raw_labels)
-        if self.extra_features is not None:
-            extra_features = self.get_features(self.extra_features)
-        else:
+        raw_labels, extra_features = self.get_labels_and_features()
+        if extra_features is None:
             extra_features = [None] * len(molecules)
 
         # get state info
@@ -887,7 +1355,13 @@ class ReactionNetworkDataset(BaseDataset):
             assert species is not None, "Corrupted state_dict file, `species` not found"
 
         # create dgl graphs
-        graphs = self.build_graphs(self.grapher, molecules, extra_features, species)
+        graphs = self.build_graphs(
+            self.grapher,
+            molecules,
+            extra_features,
+            species,
+            num_workers=self.num_workers,
+        )
         graphs_not_none_indices = [i for i, g in enumerate(graphs) if g is not None]
 
         # store feature name and size
@@ -928,16 +1402,15 @@ class ReactionNetworkDataset(BaseDataset):
 
         # create reaction
         reactions = []
-        self.labels = []
+        values = []
+        fields = defaultdict(list)
         self._failed = []
+        valid_set = frozenset(graphs_not_none_indices)
         for i, lb in enumerate(raw_labels):
             mol_ids = lb["reactants"] + lb["products"]
-
-            for d in mol_ids:
-                # ignore reaction whose reactants or products molecule is None
-                if d not in graphs_not_none_indices:
-                    self._failed.append(True)
-                    break
+            # ignore reaction whose reactants or products molecule is None
+            if not valid_set.issuperset(mol_ids):
+                self._failed.append(True)
             else:
                 rxn = ReactionInNetwork(
                     reactants=lb["reactants"],
@@ -951,17 +1424,15 @@ class ReactionNetworkDataset(BaseDataset):
                     environemnt = lb["environment"]
                 else:
                     environemnt = None
-                label = {
-                    "value": torch.tensor(
-                        lb["value"], dtype=getattr(torch, self.dtype)
-                    ),
-                    "id": lb["id"],
-                    "environment": environemnt,
-                }
-                self.labels.append(label)
+                values.append(lb["value"])
+                fields["id"].append(lb["id"])
+                fields["environment"].append(environemnt)
 
                 self._failed.append(False)
 
+        values = torch.tensor(values, dtype=getattr(torch, self.dtype))
+        self.labels = ReactionLabels(values, None, fields)
+
         self.reaction_ids = list(range(len(reactions)))
 
         # create reaction network
@@ -970,8 +1441,6 @@ class ReactionNetworkDataset(BaseDataset):
         # feature transformers
         if self.label_transformer:
             # normalization
-            values = torch.stack([lb["value"] for lb in self.labels])  # 1D tensor
-
             if self.state_dict_filename is None:
                 mean = torch.mean(values)
                 std = torch.std(values)
@@ -987,13 +1456,10 @@ class ReactionNetworkDataset(BaseDataset):
                 mean = self._label_scaler_mean
                 std = self._label_scaler_std
 
-            values = (values - mean) / std
-
-            # update label
-            for i, lb in enumerate(values):
-                self.labels[i]["value"] = lb
-                self.labels[i]["scaler_mean"] = mean
-                self.labels[i]["scaler_stdev"] = std
+            # mean and std are stored once and shared by all labels
+            self.labels.values = (values - mean) / std
+            self.labels.scaler_mean = mean
+            self.labels.scaler_stdev = std
 
             logger.info(f"Label scaler mean: {mean}")
             logger.info(f"Label scaler std: {std}")
@@ -1001,7 +1467,7 @@ class ReactionNetworkDataset(BaseDataset):
         logger.info(f"Finish loading {len(self.labels)} reactions...")
 
     @staticmethod
-    def build_graphs(grapher, molecules, features, species):
+    def build_graphs(grapher, molecules, features, species, num_workers=None):
         """
         Build DGL graphs using grapher for the molecules.
 
@@ -1010,36 +1476,27 @@ class ReactionNetworkDataset(BaseDataset):
             molecules (list): rdkit molecules
             features (list): each element is a dict of extra features for a molecule
             species (list): chemical species (str) in all molecules
+            num_workers (int): number of processes to build the graphs with. If
+                `None`, see :func:`build_graphs_parallel`.
 
         Returns:
             list: DGL graphs
         """
 
-        graphs = []
-        for i, (m, feats) in enumerate(zip(molecules, features)):
-            if m is not None:
-                g = grapher.build_graph_and_featurize(
-                    m, extra_feats_info=feats, dataset_species=species
-                )
-                # add this for check purpose; some entries in the sdf file may fail
-                g.graph_id = i
-            else:
-                g = None
-
-            graphs.append(g)
-
-        return graphs
+        return build_graphs_parallel(
+            grapher, molecules, features, species, num_workers=num_workers
+        )
 
     @staticmethod
-    def get_labels(labels):
+    def get_labels(labels, cache=False):
         if isinstance(labels, Path):
-            labels = yaml_load(labels)
+            labels = yaml_load(labels, cache=cache)
         return labels
 
     @staticmethod
-    def get_features(features):
+    def get_features(features, cache=False):
         if isinstance(features, Path):
-            features = yaml_load(features)
+            features = yaml_load(features, cache=cache)
         return features
 
     def __getitem__(self, item):
@@ -1051,6 +1508,22 @@ class ReactionNetworkDataset(BaseDataset):
 
 
 class ReactionNetworkDatasetPrecomputed(BaseDataset):
+    """
+    Reaction network dataset with the reaction graphs and features prebuilt.
+
+    Building the reaction graphs is expensive. If `cache_path` is given, the built
+    reaction graphs, labels and dataset state are saved there and reused by later
+    runs with the same data file (path and mtime), grapher and dataset options. A
+    dataset loaded from the cache has no `molecules` and `reaction_network`, only
+    what is needed for `__getitem__`.
+
+    The reaction graphs are built from the molecule graphs, which are built in a
+    process pool for more than 128 molecules unless `num_workers` (or, if it is
+    `None`, the environment variable `BONDNET_GRAPH_WORKERS`) is `1`. On platforms
+    that start processes by spawning (Windows, macOS), the script creating the
+    dataset then needs an `if __name__ == "__main__":` guard.
+    """
+
     def __init__(
         self,
         grapher,
@@ -1070,10 +1543,65 @@ class ReactionNetworkDatasetPrecomputed(BaseDataset):
         extra_keys=None,
         dataset_atom_types=None,
         extra_info=None,
+        cache_path=None,
+        cache_yaml=False,
+        num_workers=None,
     ):
         if dtype not in ["float32", "float64"]:
             raise ValueError(f"`dtype {dtype}` should be `float32` or `float64`.")
         self.grapher = grapher
+        self.molecules = None
+        self.raw_labels = None
+        self.extra_features = None
+        self.feature_transformer = feature_transformer
+        self.label_transformer = label_transformer
+        self.dtype = dtype
+        self.state_dict_filename = None
+        self.cache_yaml = cache_yaml
+        self.num_workers = num_workers
+        self.graphs = None
+        self.labels = None
+        self.target = target
+        self.extra_keys = extra_keys
+        self._feature_size = None
+        self._feature_name = None
+        self._feature_scaler_mean = None
+        self._feature_scaler_std = None
+        self._label_scaler_mean = None
+        self._label_scaler_std = None
+        self._species = None
+        self._elements = dataset_atom_types
+        self._failed = None
+        self.classifier = classifier
+        self.classif_categories = classif_categories
+        self.device = device
+        self._reaction_network = None
+        self._reaction_network_inputs = None
+
+        self.cache_path = to_path(cache_path) if cache_path is not None else None
+        self._cache_key = [
+            _grapher_signature(grapher),
+            str(file),
+            os.path.getmtime(file) if os.path.exists(str(file)) else None,
+            feature_transformer,
+            label_transformer,
+            dtype,
+            target,
+            filter_species,
+            filter_outliers,
+            filter_sparse_rxns,
+            feature_filter,
+            classifier,
+            debug,
+            classif_categories,
+            extra_keys,
+            dataset_atom_types,
+            extra_info,
+        ]
+        if self._load_cache():
+            logger.info(f"Loaded {len(self)} reactions from cache {self.cache_path}")
+            return
+
         (
             all_mols,
             all_labels,
@@ -1095,36 +1623,78 @@ class ReactionNetworkDatasetPrecomputed(BaseDataset):
         self.molecules = all_mols
         self.raw_labels = all_labels
         self.extra_features = features
-        self.feature_transformer = feature_transformer
-        self.label_transformer = label_transformer
-        self.dtype = dtype
-        self.state_dict_filename = None
-        self.graphs = None
-        self.labels = None
-        self.target = target
-        self.extra_keys = extra_keys
-        self._feature_size = None
-        self._feature_name = None
-        self._feature_scaler_mean = None
-        self._feature_scaler_std = None
-        self._label_scaler_mean = None
-        self._label_scaler_std = None
-        self._species = None
-        self._elements = dataset_atom_types
-        self._failed = None
-        self.classifier = classifier
-        self.classif_categories = classif_categories
-        self.device = device
         self._load()
+        self._save_cache()
+
+    @property
+    def reaction_network(self):
+        """
+        Reaction network of the molecule graphs, built on first access. Training uses
+        the prebuilt reaction graphs only, so it is not built in `_load`. `None` if
+        the dataset is loaded from the cache.
+        """
+        if self._reaction_network is None and self._reaction_network_inputs is not None:
+            self._reaction_network = ReactionNetwork(*self._reaction_network_inputs)
+        return self._reaction_network
+
+    def _cache_hash(self):
+        return hashlib.sha1(repr(self._cache_key).encode()).hexdigest()
+
+    def _load_cache(self):
+        """
+        Load reaction graphs, labels and dataset state from the cache if it is valid.
+
+        Returns:
+            bool: whether the cache is loaded
+        """
+        if self.cache_path is None or not self.cache_path.exists():
+            return False
+
+        meta = torch.load(str(self.cache_path))
+        if meta["hash"] != self._cache_hash():
+            logger.info(f"Reaction graph cache {self.cache_path} outdated, rebuilding")
+            return False
+
+        self.reaction_graphs = load_graphs_cache(self.cache_path, meta)
+        if self.device is not None:
+            self.reaction_graphs = graphs_to_device(self.reaction_graphs, self.device)
+        # the reaction features are the `ft` node data of the reaction graphs
+        self.reaction_features = [
+            {nt: g.nodes[nt].data["ft"] for nt in g.ntypes}
+            for g in self.reaction_graphs
+        ]
+        self.labels = meta["labels"]
+        self.reaction_ids = list(range(len(self.labels)))
+        self._failed = meta["failed"]
+        self.load_state_dict(meta["state_dict"])
+        return True
+
+    def _save_cache(self):
+        if self.cache_path is None:
+            return
+
+        meta = {
+            "hash": self._cache_hash(),
+            "labels": self.labels,
+            "failed": self._failed,
+            "state_dict": self.state_dict(),
+        }
+        graphs = self.reaction_graphs
+        if self.device is not None:
+            graphs = graphs_to_device(graphs, torch.device("cpu"))
+        save_graphs_cache(self.cache_path, graphs, meta)
+        logger.info(f"Saved reaction graph cache to {self.cache_path}")
 
     def _load(self):
         logger.info("Start loading dataset")
 
         # get molecules, labels, and extra features
         molecules = self.get_molecules(self.molecules)
-        raw_labels = self.get_labels(self.raw_labels)
+        raw_labels = self.get_labels(self.raw_labels, cache=self.cache_yaml)
         if self.extra_features is not None:
-            extra_features = self.get_features(self.extra_features)
+            extra_features = self.get_features(
+                self.extra_features, cache=self.cache_yaml
+            )
         else:
             extra_features = [None] * len(molecules)
 
@@ -1133,28 +1703,25 @@ class ReactionNetworkDatasetPrecomputed(BaseDataset):
             logger.info(f"Load dataset state dict from: {self.state_dict_filename}")
             state_dict = torch.load(str(self.state_dict_filename))
             self.load_state_dict(state_dict)
+            _check_state_dict_species(self._species)
 
-        # get species
-        # species = get_dataset_species_from_json(self.pandas_df)
-        system_species = set()
-        for mol in self.molecules:
-            species = list(set(mol.species))
-            system_species.update(species)
-
-        self._species = sorted(system_species)
-        # this is hard coded and potentially needs to be adjusted for other datasets, this is to have fixed size and order of the species
-        self._species = ["C", "F", "H", "N", "O", "Mg", "Li", "S", "Cl", "P", "O", "Br"]
-        
+        # get species, fixed to have the same size and order of the species features
+        # for all datasets
+        self._species = list(DATASET_SPECIES)
 
         # create dgl graphs
-        print("constructing graphs & features....")
+        logger.info("Constructing graphs & features")
 
         graphs = self.build_graphs(
-            self.grapher, self.molecules, extra_features, self._species
+            self.grapher,
+            self.molecules,
+            extra_features,
+            self._species,
+            num_workers=self.num_workers,
         )
         graphs_not_none_indices = [i for i, g in enumerate(graphs) if g is not None]
-        print("number of graphs valid: " + str(len(graphs_not_none_indices)))
-        print("number of graphs: " + str(len(graphs)))
+        logger.info(f"Number of valid graphs: {len(graphs_not_none_indices)}")
+        logger.info(f"Number of graphs: {len(graphs)}")
         # store feature name and size
         self._feature_name = self.grapher.feature_name
         self._feature_size = self.grapher.feature_size
@@ -1177,21 +1744,12 @@ class ReactionNetworkDatasetPrecomputed(BaseDataset):
                     mean=self._feature_scaler_mean, std=self._feature_scaler_std
                 )
 
-            graphs_not_none = [graphs[i] for i in graphs_not_none_indices]
-            graphs_not_none = feature_scaler(graphs_not_none)
-            molecules_ordered = [self.molecules[i] for i in graphs_not_none_indices]
-            molecules_final = [0 for i in graphs_not_none_indices]
-            # update graphs
-            for i, g in zip(graphs_not_none_indices, graphs_not_none):
-                molecules_final[i] = molecules_ordered[i]
-                graphs[i] = g
-            self.molecules_ordered = molecules_final
-
+            # move to device before scaling, so the scaler runs on device as well
             if self.device != None:
-                graph_temp = []
-                for g in graphs:
-                    graph_temp.append(g.to(self.device))
-                graphs = graph_temp
+                graphs = graphs_to_device(graphs, self.device)
+
+            # the scaler updates the graphs in place
+            feature_scaler([graphs[i] for i in graphs_not_none_indices])
 
             if self.state_dict_filename is None:
                 self._feature_scaler_mean = feature_scaler.mean
@@ -1202,15 +1760,17 @@ class ReactionNetworkDatasetPrecomputed(BaseDataset):
 
         # create reaction
         reactions = []
-        self.labels = []
+        values = []
+        values_rev = []
+        fields = defaultdict(list)
         self._failed = []
+        valid_set = frozenset(graphs_not_none_indices)
+        torch_dtype = getattr(torch, self.dtype)
         for i, lb in enumerate(raw_labels):
             mol_ids = lb["reactants"] + lb["products"]
-            for d in mol_ids:
-                # ignore reaction whose reactants or products molecule is None
-                if d not in graphs_not_none_indices:
-                    self._failed.append(True)
-                    break
+            # ignore reaction whose reactants or products molecule is None
+            if not valid_set.issuperset(mol_ids):
+                self._failed.append(True)
             else:
                 rxn = ReactionInNetwork(
                     reactants=lb["reactants"],
@@ -1230,54 +1790,43 @@ class ReactionNetworkDatasetPrecomputed(BaseDataset):
                     environemnt = None
 
                 if self.classifier:
-                    lab_temp = torch.zeros(self.classif_categories)
-                    lab_temp[int(lb["value"][0])] = 1
-
+                    # categories, one-hot encoded after the loop
+                    values.append(int(lb["value"][0]))
                     if lb["value_rev"] != None:
-                        lab_temp_rev = torch.zeros(self.classif_categories)
-                        lab_temp[int(lb["value_rev"][0])] = 1
+                        values_rev.append(int(lb["value_rev"][0]))
                     else:
-                        lab_temp_rev = None
-
-                    label = {
-                        "value": lab_temp,
-                        "value_rev": lab_temp_rev,
-                        "id": lb["id"],
-                        "environment": environemnt,
-                        "atom_map": lb["atom_mapping"],
-                        "bond_map": lb["bond_mapping"],
-                        "total_bonds": lb["total_bonds"],
-                        "total_atoms": lb["total_atoms"],
-                        "reaction_type": lb["reaction_type"],
-                        "extra_info": lb["extra_info"],
-                    }
-                    self.labels.append(label)
+                        values_rev.append(None)
                 else:
-                    label = {
-                        "value": torch.tensor(
-                            lb["value"], dtype=getattr(torch, self.dtype)
-                        ),
-                        "value_rev": torch.tensor(
-                            lb["value_rev"], dtype=getattr(torch, self.dtype)
-                        ),
-                        "id": lb["id"],
-                        "environment": environemnt,
-                        "atom_map": lb["atom_mapping"],
-                        "bond_map": lb["bond_mapping"],
-                        "total_bonds": lb["total_bonds"],
-                        "total_atoms": lb["total_atoms"],
-                        "reaction_type": lb["reaction_type"],
-                        "extra_info": lb["extra_info"],
-                    }
-                    self.labels.append(label)
+                    values.append(lb["value"])
+                    values_rev.append(lb["value_rev"])
+
+                fields["id"].append(lb["id"])
+                fields["environment"].append(environemnt)
+                fields["atom_map"].append(lb["atom_mapping"])
+                fields["bond_map"].append(lb["bond_mapping"])
+                fields["total_bonds"].append(lb["total_bonds"])
+                fields["total_atoms"].append(lb["total_atoms"])
+                fields["reaction_type"].append(lb["reaction_type"])
+                fields["extra_info"].append(lb["extra_info"])
 
                 self._failed.append(False)
 
+        if self.classifier:
+            values, values_rev = _one_hot_classes(
+                values, values_rev, self.classif_categories
+            )
+        else:
+            values = torch.tensor(values, dtype=torch_dtype)
+            values_rev = torch.tensor(values_rev, dtype=torch_dtype)
+        self.labels = ReactionLabels(values, values_rev, fields)
+
         self.reaction_ids = list(range(len(reactions)))
 
         # create reaction network
-        self.reaction_network = ReactionNetwork(graphs, reactions, molecules_final)
-        print("prebuilding reaction graphs")
+        # the reaction network is only built if asked for, see `reaction_network`
+        self.molecules_ordered = [self.molecules[i] for i in graphs_not_none_indices]
+        self._reaction_network_inputs = (graphs, reactions, self.molecules_ordered)
+        logger.info("Prebuilding reaction graphs")
         self.reaction_graphs, self.reaction_features = self.build_reaction_graphs(
             graphs, reactions, device=self.device
         )
@@ -1285,9 +1834,6 @@ class ReactionNetworkDatasetPrecomputed(BaseDataset):
         # feature transformers
         if self.label_transformer:
             # normalization
-            values = torch.stack([lb["value"] for lb in self.labels])  # 1D tensor
-            values_rev = torch.stack([lb["value_rev"] for lb in self.labels])
-
             if self.state_dict_filename is None:
                 mean = torch.mean(values)
                 std = torch.std(values)
@@ -1303,15 +1849,12 @@ class ReactionNetworkDatasetPrecomputed(BaseDataset):
                 mean = self._label_scaler_mean
                 std = self._label_scaler_std
 
-            values = (values - mean) / std
-            value_rev_scaled = (values_rev - mean) / std
-
-            # update label
-            for i, lb in enumerate(values):
-                self.labels[i]["value"] = lb
-                self.labels[i]["scaler_mean"] = mean
-                self.labels[i]["scaler_stdev"] = std
-                self.labels[i]["value_rev"] = value_rev_scaled[i]
+            # standardize both directions in place on one stacked buffer
+            scaled = torch.stack([values, values_rev]).sub_(mean).div_(std)
+            self.labels.values = scaled[0]
+            self.labels.values_rev = scaled[1]
+            self.labels.scaler_mean = mean
+            self.labels.scaler_stdev = std
 
             logger.info(f"Label scaler mean: {mean}")
             logger.info(f"Label scaler std: {std}")
@@ -1319,7 +1862,7 @@ class ReactionNetworkDatasetPrecomputed(BaseDataset):
         logger.info(f"Finish loading {len(self.labels)} reactions...")
 
     @staticmethod
-    def build_graphs(grapher, molecules, features, species):
+    def build_graphs(grapher, molecules, features, species, num_workers=None):
         """
         Build DGL graphs using grapher for the molecules.
 
@@ -1328,42 +1871,56 @@ class ReactionNetworkDatasetPrecomputed(BaseDataset):
             molecules (list): rdkit molecules
             features (list): each element is a dict of extra features for a molecule
             species (list): chemical species (str) in all molecules
+            num_workers (int): number of processes to build the graphs with. If
+                `None`, see :func:`build_graphs_parallel`.
 
         Returns:
             list: DGL graphs
         """
 
-        count = 0
-        graphs = []
-
-        for ind, mol in enumerate(molecules):
-            feats = features[count]
-            if mol is not None:
-                g = grapher.build_graph_and_featurize(
-                    mol, extra_feats_info=feats, dataset_species=species
-                )
-
-                # add this for check purpose; some entries in the sdf file may fail
-                g.graph_id = ind
-            else:
-                g = None
-            graphs.append(g)
-            count += 1
-
-        return graphs
+        return build_graphs_parallel(
+            grapher, molecules, features, species, num_workers=num_workers
+        )
 
     @staticmethod
-    def get_labels(labels):
+    def get_labels(labels, cache=False):
         if isinstance(labels, Path):
-            labels = yaml_load(labels)
+            labels = yaml_load(labels, cache=cache)
         return labels
 
     @staticmethod
-    def get_features(features):
+    def get_features(features, cache=False):
         if isinstance(features, Path):
-            features = yaml_load(features)
+            features = yaml_load(features, cache=cache)
         return features
 
+    def share_memory_(self):
+        """
+        Store the reaction features of each node type in a single shared-memory
+        tensor, and make the per-reaction features and the `ft` data of the reaction
+        graphs views into it.
+
+        Call this before iterating the dataset with a multi-worker DataLoader, such
+        that the workers read the features from shared memory rather than each
+        holding and sending its own copies of many small tensors. Do not call it
+        before pickling individual samples (e.g. writing them to lmdb), as a pickled
+        view carries the whole tensor it views into.
+
+        Returns:
+            self
+        """
+        self._feat_bank = {}
+        for nt in self.reaction_features[0]:
+            feats = [ft[nt] for ft in self.reaction_features]
+            bank = torch.cat(feats).share_memory_()
+            views = torch.split(bank, [len(ft) for ft in feats])
+            for g, fts, ft in zip(self.reaction_graphs, self.reaction_features, views):
+                fts[nt] = ft
+                g.nodes[nt].data["ft"] = ft
+            self._feat_bank[nt] = bank
+
+        return self
+
     def __getitem__(self, item):
         rn, rxn, lb = (
             self.reaction_graphs[item],
@@ -1391,18 +1948,11 @@ class ReactionNetworkDatasetPrecomputed(BaseDataset):
                 "num_bonds_total": rxn.num_bonds_total,
                 "num_atoms_total": rxn.num_atoms_total,
             }
-            has_bonds = {
-                "reactants": [
-                    True if len(mp) > 0 else False for mp in rxn.bond_mapping[0]
-                ],
-                "products": [
-                    True if len(mp) > 0 else False for mp in rxn.bond_mapping[1]
-                ],
-            }
+            has_bonds = get_has_bonds(rxn.bond_mapping)
             if len(has_bonds["reactants"]) != len(reactants) or len(
                 has_bonds["products"]
             ) != len(products):
-                print("unequal mapping & graph len")
+                logger.warning(f"Unequal mapping & graph len of reaction {rxn.id}")
 
             g, fts = create_rxn_graph(
                 reactants,
@@ -1413,32 +1963,26 @@ class ReactionNetworkDatasetPrecomputed(BaseDataset):
                 reverse=False,
                 ft_name="feat",
             )
+            # write the features to the graph right away, one frame update per
+            # node type, instead of a second pass over all reaction graphs
+            for nt, ft in fts.items():
+                g.nodes[nt].data["ft"] = ft
+
+            # error checking, stripped under `python -O`
+            if __debug__:
+                feat_len_dict = {nt: ft.shape[0] for nt, ft in fts.items()}
+                if sum(feat_len_dict.values()) != g.number_of_nodes():
+                    logger.warning(
+                        f"Number of reaction features {feat_len_dict} and graph "
+                        f"nodes {g.number_of_nodes()} differ for reaction {rxn.id}; "
+                        f"atom mapping: {rxn.atom_mapping}, bond mapping: "
+                        f"{rxn.bond_mapping}, total bonds: {rxn.total_bonds}, "
+                        f"total atoms: {rxn.total_atoms}"
+                    )
+
             reaction_graphs.append(g)
             reaction_fts.append(fts)
 
-        for i, g, ind in zip(reaction_fts, reaction_graphs, range(len(reaction_fts))):
-            feat_len_dict = {}
-            total_feats = 0
-
-            for nt, ft in i.items():
-                # print(nt)
-                total_feats += i[nt].shape[0]
-                feat_len_dict[nt] = i[nt].shape[0]
-                # write to graph
-                g.nodes[nt].data.update({"ft": ft})
-
-                # g.nodes["bond"].data.update(i["bond"])
-                # g.nodes["global"].data.update(i["global"])
-
-            if total_feats != g.number_of_nodes():  # error checking
-                print(g)
-                print(feat_len_dict)
-                print(reactions[ind].atom_mapping)
-                print(reactions[ind].bond_mapping)
-                print(reactions[ind].total_bonds)
-                print(reactions[ind].total_atoms)
-                print("--" * 20)
-
         return reaction_graphs, reaction_fts
 
 
@@ -1462,6 +2006,31 @@ class Subset(BaseDataset):
     def __len__(self):
         return len(self.indices)
 
+    def label_ids(self):
+        ids = self.dataset.label_ids()
+        return [ids[i] for i in self.indices]
+
+
+def _get_label_ids(dataset):
+    """
+    Ids of the labels of a dataset, read from `dataset.label_ids()` if available,
+    otherwise from the label (last element) of each data point.
+    """
+    if hasattr(dataset, "label_ids"):
+        return dataset.label_ids()
+    return [sample[-1]["id"] for sample in dataset]
+
+
+def _split_random_state(random_seed):
+    """
+    Random state of the dataset splits. A seeded state has its own stream, the same
+    one `np.random.seed(random_seed)` gives, such that splits do not change for a
+    given seed but the global random state is left alone.
+    """
+    if random_seed is None:
+        return np.random
+    return np.random.RandomState(random_seed)
+
 
 def train_validation_test_split(dataset, validation=0.1, test=0.1, random_seed=None):
     """
@@ -1477,7 +2046,7 @@ def train_validation_test_split(dataset, validation=0.1, test=0.1, random_seed=N
         test (float, optional): The amount of data (fraction) to be assigned to test
             set. Defaults to 0.1.
         random_seed (int, optional): random seed that determines the permutation of the
-            dataset. Defaults to 35.
+            dataset. If `None`, the global numpy random state is used.
 
     Returns:
         [train set, validation set, test_set]
@@ -1488,9 +2057,8 @@ def train_validation_test_split(dataset, validation=0.1, test=0.1, random_seed=N
     num_test = int(size * test)
     num_train = size - num_val - num_test
 
-    if random_seed is not None:
-        np.random.seed(random_seed)
-    idx = np.random.permutation(size)
+    rng = _split_random_state(random_seed)
+    idx = rng.permutation(size)
     train_idx = idx[:num_train]
     val_idx = idx[num_train : num_train + num_val]
     test_idx = idx[num_train + num_val :]
@@ -1521,7 +2089,7 @@ def train_validation_test_split_test_with_all_bonds_of_mol(
         test (float, optional): The amount of data (fraction) to be assigned to test
             set. Defaults to 0.1.
         random_seed (int, optional): random seed that determines the permutation of the
-            dataset. Defaults to 35.
+            dataset. If `None`, the global numpy random state is used.
 
     Returns:
         [train set, validation set, test_set]
@@ -1534,14 +2102,13 @@ def train_validation_test_split_test_with_all_bonds_of_mol(
 
     # group by molecule
     groups = defaultdict(list)
-    for i, (_, label) in enumerate(dataset):
-        groups[label["id"]].append(i)
+    for i, label_id in enumerate(_get_label_ids(dataset)):
+        groups[label_id].append(i)
     groups = [val for key, val in groups.items()]
 
     # permute on the molecule level
-    if random_seed is not None:
-        np.random.seed(random_seed)
-    idx = np.random.permutation(len(groups))
+    rng = _split_random_state(random_seed)
+    idx = rng.permutation(len(groups))
     test_idx = []
     train_val_idx = []
     for i in idx:
@@ -1551,7 +2118,7 @@ def train_validation_test_split_test_with_all_bonds_of_mol(
             train_val_idx.extend(groups[i])
 
     # permute on the bond level for train and validation
-    idx = np.random.permutation(train_val_idx)
+    idx = rng.permutation(train_val_idx)
     train_idx = idx[:num_train]
     val_idx = idx[num_train:]
 
@@ -1578,7 +2145,7 @@ def train_validation_test_split_selected_bond_in_train(
         test (float, optional): The amount of data (fraction) to be assigned to test
             set. Defaults to 0.1.
         random_seed (int, optional): random seed that determines the permutation of the
-            dataset. Defaults to 35.
+            dataset. If `None`, the global numpy random state is used.
         selected_bond_type (tuple): breaking bond in `selected_bond_type` are all
             included in training set, e.g. `selected_bonds = (('H','H'), (('H', 'F'))`
 
@@ -1591,20 +2158,27 @@ def train_validation_test_split_selected_bond_in_train(
     num_test = int(size * test)
     # num_train = size - num_val - num_test
 
-    # index of bond in selected_bond
-    selected_idx = []
-    selected = [tuple(sorted(i)) for i in selected_bond_type]
-    for i, (_, _, label) in enumerate(dataset):
-        bond_type = tuple(sorted(label["id"].split("-")[-2:]))
-        if bond_type in selected:
-            selected_idx.append(i)
-
-    all_idx = np.arange(size)
-    all_but_selected_idx = list(set(all_idx) - set(selected_idx))
-
-    if random_seed is not None:
-        np.random.seed(random_seed)
-    idx = np.random.permutation(all_but_selected_idx)
+    # index of bond in selected_bond, the bond type of each label is encoded as an
+    # integer code such that the selection is a single array op
+    selected = {tuple(sorted(i)) for i in selected_bond_type}
+    bond_type_codes = {}
+    codes = np.fromiter(
+        (
+            bond_type_codes.setdefault(
+                tuple(sorted(label_id.split("-")[-2:])), len(bond_type_codes)
+            )
+            for label_id in _get_label_ids(dataset)
+        ),
+        dtype=np.int64,
+        count=size,
+    )
+    wanted = [c for bt, c in bond_type_codes.items() if bt in selected]
+    is_selected = np.isin(codes, wanted)
+    selected_idx = np.flatnonzero(is_selected).tolist()
+    all_but_selected_idx = np.flatnonzero(~is_selected)
+
+    rng = _split_random_state(random_seed)
+    idx = rng.permutation(all_but_selected_idx)
 
     val_idx = idx[:num_val]
     test_idx = idx[num_val : num_val + num_test]
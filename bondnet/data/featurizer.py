@@ -17,6 +17,7 @@ from bondnet.utils import *
 from bondnet.data.utils import (
     one_hot_encoding,
     h_count_and_degree,
+    h_count_and_degree_full,
     ring_features_from_atom_full,
     ring_features_for_bonds_full,
     rdkit_bond_desc,
@@ -27,6 +28,13 @@ from rdkit import RDLogger
 lg = RDLogger.logger()
 lg.setLevel(RDLogger.CRITICAL)
 
+# atomic weights keyed by chemical symbol, built once at import instead of querying the
+# rdkit periodic table for every atom type of every molecule
+_pt = GetPeriodicTable()
+ATOMIC_WEIGHTS = {
+    _pt.GetElementSymbol(z): _pt.GetAtomicWeight(z) for z in range(1, 119)
+}
+
 
 class BaseFeaturizer:
     def __init__(self, dtype="float32"):
@@ -35,6 +43,8 @@ class BaseFeaturizer:
                 "`dtype` should be `float32` or `float64`, but got `{}`.".format(dtype)
             )
         self.dtype = dtype
+        # resolved once, not for every featurized molecule
+        self._np_dtype = np.dtype(dtype)
         self._feature_size = None
         self._feature_name = None
 
@@ -120,7 +130,9 @@ class DistanceBins(BaseFeaturizer):
     def __init__(self, low=2.0, high=6.0, num_bins=10):
         super(DistanceBins, self).__init__()
         self.num_bins = num_bins
-        self.bins = np.linspace(low, high, num_bins - 1, endpoint=True)
+        self.bins = np.linspace(
+            low, high, num_bins - 1, endpoint=True, dtype=np.float32
+        )
         self.bin_indices = np.arange(num_bins)
 
     @property
@@ -154,7 +166,7 @@ class RBF(BaseFeaturizer):
     def __init__(self, low=0.0, high=4.0, num_centers=20):
         super(RBF, self).__init__()
         self.num_centers = num_centers
-        self.centers = np.linspace(low, high, num_centers)
+        self.centers = np.linspace(low, high, num_centers, dtype=np.float32)
         self.gap = self.centers[1] - self.centers[0]
 
     @property
@@ -248,22 +260,15 @@ class BondAsNodeGraphFeaturizerGeneral(BondFeaturizer):
         num_feats = len(self.selected_keys)
         num_feats += 7
 
+        np_dtype = self._np_dtype
+
         if num_bonds == 0:
-            ft = [0.0 for _ in range(num_feats)]
+            size = num_feats
             if self.length_featurizer:
-                ft += [0.0 for _ in range(len(self.length_featurizer.feature_name))]
-            feats = [ft]
+                size += len(self.length_featurizer.feature_name)
+            feats = np.zeros((1, size), dtype=np_dtype)
 
         else:
-            features_flatten = []
-            for i in range(num_bonds):
-                feats_flatten_temp = []
-                for key in self.selected_keys:
-                    if key != "bond_length":
-                        feats_flatten_temp.append(features[key][i])
-                features_flatten.append(feats_flatten_temp)
-
-            feats = []
             for i in bond_list:
                 if i not in bond_list_no_metal:
                     bond_list_only_metal.append(i)
@@ -278,39 +283,36 @@ class BondAsNodeGraphFeaturizerGeneral(BondFeaturizer):
             ring_dict = ring_features_for_bonds_full(
                 bond_list, no_metal_binary, cycles, allowed_ring_size
             )
-            ring_dict_keys = list(ring_dict.keys())
 
-            for ind, bond in enumerate(bond_list):
-                ft = []
-
-                if tuple(bond) in ring_dict_keys:
-                    ft.append(ring_dict[tuple(bond)][0])  # metal
-                    ft.append(ring_dict[tuple(bond)][1])  #
-                    ft += ring_dict[tuple(bond)][2]  # one hot ring
-                else:
-                    ft += [0, 0]
-                    ft += [0 for i in range(len(allowed_ring_size))]
-
-                # check that features_flatten isn't empty lists
-                if features_flatten[ind] != []:
-                    ft += features_flatten[ind]
-
-                if "bond_length" in self.selected_keys:
-                    bond_len = np.sqrt(
-                        np.sum(
-                            np.square(
-                                np.array(xyz_coordinates[bond[0]])
-                                - np.array(xyz_coordinates[bond[1]])
-                            )
-                        )
-                    )
-
-                    ft.append(bond_len)
+            # features written column-wise into a preallocated buffer: metal bond,
+            # ring inclusion, one hot ring size, selected keys and the bond length
+            extra_keys = [k for k in self.selected_keys if k != "bond_length"]
+            has_length = "bond_length" in self.selected_keys
+            num_ring_feats = 2 + len(allowed_ring_size)
+            feats = np.zeros(
+                (num_bonds, num_ring_feats + len(extra_keys) + has_length),
+                dtype=np_dtype,
+            )
 
-                # ft += features[bond[0]] # check that index is correct
-                feats.append(ft)
+            for ind, bond in enumerate(bond_list):
+                ring = ring_dict.get(tuple(bond))
+                if ring is not None:
+                    feats[ind, 0] = ring[0]  # metal
+                    feats[ind, 1] = ring[1]  #
+                    feats[ind, 2:num_ring_feats] = ring[2]  # one hot ring
+
+            for j, key in enumerate(extra_keys):
+                feats[:, num_ring_feats + j] = features[key][:num_bonds]
+
+            if has_length:
+                # lengths of all bonds at once from the atom positions
+                coords = np.asarray(xyz_coordinates)
+                bond_ind = np.asarray(bond_list).reshape(-1, 2)
+                feats[:, -1] = np.linalg.norm(
+                    coords[bond_ind[:, 0]] - coords[bond_ind[:, 1]], axis=1
+                )
 
-        feats = torch.tensor(feats, dtype=getattr(torch, self.dtype))
+        feats = torch.from_numpy(feats)
         self._feature_size = feats.shape[1]
         self._feature_name = (
             ["metal bond"] + ["ring inclusion"] + ["ring size"] * 5 + self.selected_keys
@@ -331,13 +333,7 @@ class AtomFeaturizerGraphGeneral(BaseFeaturizer):
     """
 
     def __init__(self, selected_keys=[], dtype="float32"):
-        if dtype not in ["float32", "float64"]:
-            raise ValueError(
-                "`dtype` should be `float32` or `float64`, but got `{}`.".format(dtype)
-            )
-        self.dtype = dtype
-        self._feature_size = None
-        self._feature_name = None
+        super(AtomFeaturizerGraphGeneral, self).__init__(dtype)
         self.selected_keys = selected_keys
 
     def __call__(self, mol, **kwargs):
@@ -361,38 +357,46 @@ class AtomFeaturizerGraphGeneral(BaseFeaturizer):
         allowed_ring_size = [3, 4, 5, 6, 7]
 
         features = mol.atom_features
-        features_flatten, feats, bond_list = [], [], []
+        bond_list = []
         num_atoms = len(mol.coords)
         species_sites = mol.species
         bond_list_tuple = list(mol.bonds.keys())
-        # print("atom feats,", features)
-        for i in range(num_atoms):
-            feats_flatten_temp = []
-            for key in self.selected_keys:
-                # print(key, features[key])
-                feats_flatten_temp.append(features[key][i])
-            features_flatten.append(feats_flatten_temp)
 
         atom_num = len(species_sites)
         [bond_list.append(list(bond)) for bond in bond_list_tuple]
         cycles = find_rings(atom_num, bond_list, edges=False)
         ring_info = ring_features_from_atom_full(num_atoms, cycles, allowed_ring_size)
+        h_counts, degrees = h_count_and_degree_full(num_atoms, bond_list, species_sites)
+
+        # features assembled column by column into one buffer: total degree, is in
+        # ring, total H, selected keys, one hot chemical symbol and ring size
+        num_keys = len(self.selected_keys)
+        feats = np.zeros(
+            (num_atoms, 3 + num_keys + len(species) + len(allowed_ring_size)),
+            dtype=self._np_dtype,
+        )
+        feats[:, 0] = degrees
+        feats[:, 1] = [ring_info[i][0] for i in range(num_atoms)]
+        feats[:, 2] = h_counts
+        for j, key in enumerate(self.selected_keys):
+            feats[:, 3 + j] = features[key][:num_atoms]
+
+        # species not in the dataset species get an all-zero one hot encoding
+        species_start = 3 + num_keys
+        species_index = {s: i for i, s in enumerate(species)}
+        species_ind = np.fromiter(
+            (species_index.get(s, -1) for s in species_sites[:num_atoms]),
+            dtype=np.int64,
+            count=num_atoms,
+        )
+        known = np.flatnonzero(species_ind >= 0)
+        feats[known, species_start + species_ind[known]] = 1.0
+
+        feats[:, species_start + len(species) :] = [
+            ring_info[i][1] for i in range(num_atoms)
+        ]
 
-        for atom_ind in range(num_atoms):
-            ft = []
-            atom_element = species_sites[atom_ind]
-            h_count, degree = h_count_and_degree(atom_ind, bond_list, species_sites)
-            ring_inclusion, ring_size_list = ring_info[atom_ind]
-            ft.append(degree)
-            ft.append(ring_inclusion)
-            ft.append(h_count)
-
-            ft += features_flatten[atom_ind]
-            ft += one_hot_encoding((atom_element), species)
-            ft += ring_size_list
-            feats.append(ft)
-
-        feats = torch.tensor(feats, dtype=getattr(torch, self.dtype))
+        feats = torch.from_numpy(feats)
         self._feature_size = feats.shape[1]
         self._feature_name = (
             ["total degree", "is in ring", "total H"]
@@ -426,14 +430,15 @@ class GlobalFeaturizerGraph(BaseFeaturizer):
         """
         mol can either be an molwrapper object
         """
-        pt = GetPeriodicTable()
         num_atoms, mw = 0, 0
 
-        atom_types = list(mol.composition_dict.keys())
-        for atom in atom_types:
-            num_atom_type = int(mol.composition_dict[atom])
+        for atom, num_atom_type in mol.composition_dict.items():
+            num_atom_type = int(num_atom_type)
             num_atoms += num_atom_type
-            mw += num_atom_type * pt.GetAtomicWeight(atom)
+            weight = ATOMIC_WEIGHTS.get(atom)
+            if weight is None:
+                weight = _pt.GetAtomicWeight(atom)
+            mw += num_atom_type * weight
 
         g = [
             num_atoms,
@@ -468,7 +473,7 @@ class GlobalFeaturizerGraph(BaseFeaturizer):
             if self.fg_info is not None:
                 g += one_hot_encoding(mol.functional_group, self.fg_info)
 
-        feats = torch.tensor([g], dtype=getattr(torch, self.dtype))
+        feats = torch.from_numpy(np.asarray([g], dtype=self._np_dtype))
 
         self._feature_size = feats.shape[1]
         self._feature_name = ["num atoms", "num bonds", "molecule weight"]
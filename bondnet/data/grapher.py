@@ -2,6 +2,7 @@
 Build molecule graph and then featurize it.
 """
 import itertools
+import torch
 import dgl
 
 
@@ -87,26 +88,28 @@ class HeteroCompleteGraphFromMolWrapper(BaseGraph):
         bonds = list(mol.bonds.keys())
         num_bonds = len(bonds)
         num_atoms = len(mol.coords)
-        a2b = []
-        b2a = []
         if num_bonds == 0:
             num_bonds = 1
             a2b = [(0, 0)]
             b2a = [(0, 0)]
 
         else:
-            a2b = []
-            b2a = []
-            for b in range(num_bonds):
-                u = bonds[b][0]
-                v = bonds[b][1]
-                b2a.extend([[b, u], [b, v]])
-                a2b.extend([[u, b], [v, b]])
-
-        a2g = [(a, 0) for a in range(num_atoms)]
-        g2a = [(0, a) for a in range(num_atoms)]
-        b2g = [(b, 0) for b in range(num_bonds)]
-        g2b = [(0, b) for b in range(num_bonds)]
+            # each bond is connected to its two atoms, i.e. edges (u, b), (v, b) for
+            # every bond b in order
+            bond_atoms = torch.tensor(bonds, dtype=torch.int64).reshape(-1)
+            bond_twice = torch.arange(num_bonds).repeat_interleave(2)
+            a2b = (bond_atoms, bond_twice)
+            b2a = (bond_twice, bond_atoms)
+
+        # edges to and from the single global node, as index tensors
+        atom_ids = torch.arange(num_atoms)
+        bond_ids = torch.arange(num_bonds)
+        atom_zeros = torch.zeros(num_atoms, dtype=torch.int64)
+        bond_zeros = torch.zeros(num_bonds, dtype=torch.int64)
+        a2g = (atom_ids, atom_zeros)
+        g2a = (atom_zeros, atom_ids)
+        b2g = (bond_ids, bond_zeros)
+        g2b = (bond_zeros, bond_ids)
 
         edges_dict = {
             ("atom", "a2b", "bond"): a2b,
@@ -117,9 +120,9 @@ class HeteroCompleteGraphFromMolWrapper(BaseGraph):
             ("global", "g2b", "bond"): g2b,
         }
         if self.self_loop:
-            a2a = [(i, i) for i in range(num_atoms)]
-            b2b = [(i, i) for i in range(num_bonds)]
-            g2g = [(0, 0)]
+            a2a = (atom_ids, atom_ids)
+            b2b = (bond_ids, bond_ids)
+            g2g = (atom_zeros[:1], atom_zeros[:1])
             edges_dict.update(
                 {
                     ("atom", "a2a", "atom"): a2a,
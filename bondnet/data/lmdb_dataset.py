@@ -4,18 +4,77 @@
 #give dgl graphs, reaction features, meta. write them into lmdb file.
 #1. check expend lmdb reasonably
 
-from torch.utils.data import Dataset
+"""
+Write reaction network datasets to lmdb files and read them back.
+
+The lmdb files are written without syncing to disk after each commit (`sync=False`,
+`metasync=False`) and are only flushed once at the end of a successful write. They
+are regenerated from the raw data, so if the preprocessing run crashes or the
+machine goes down while writing, the partial files should be removed and the run
+repeated.
+"""
+
+from torch.utils.data import Dataset, random_split
 from pathlib import Path
 import numpy as np
 import pickle
 import lmdb
-from torch.utils.data import random_split
 import multiprocessing as mp
 import os
+import sys
 import pickle
 from tqdm import tqdm
 import glob 
 
+try:
+    import blosc
+except ImportError:
+    blosc = None
+
+# number of samples written per lmdb write transaction
+WRITE_BATCH_SIZE = 1000
+MERGE_BATCH_SIZE = 10000
+
+# prefix of blosc compressed samples; uncompressed samples are plain pickles, which
+# start with the pickle protocol opcode instead
+_BLOSC_MAGIC = b"BLOSC"
+
+
+def _idx_key(idx):
+    """
+    Key of the sample with index `idx`: 8 bytes big endian, such that the byte order
+    of the keys is their numeric order and samples can be appended in order.
+    """
+    return idx.to_bytes(8, "big")
+
+
+def _is_idx_key(key):
+    # property keys are ascii names, which never start with a null byte
+    return len(key) == 8 and key[0] == 0
+
+
+def _encode(obj, compress=False):
+    """
+    Serialize a sample to bytes, compressed with blosc (lz4) if `compress`.
+    """
+    buf = pickle.dumps(obj, protocol=-1)
+    if compress:
+        if blosc is None:
+            raise ImportError("`blosc` is required to compress lmdb samples")
+        buf = _BLOSC_MAGIC + blosc.compress(buf, typesize=4, cname="lz4", clevel=3)
+    return buf
+
+
+def _decode(buf):
+    """
+    Deserialize a sample written by `_encode`, compressed or not.
+    """
+    if buf[: len(_BLOSC_MAGIC)] == _BLOSC_MAGIC:
+        if blosc is None:
+            raise ImportError("`blosc` is required to read compressed lmdb samples")
+        buf = blosc.decompress(bytes(buf[len(_BLOSC_MAGIC) :]))
+    return pickle.loads(buf)
+
 
 class LmdbDataset(Dataset):
     """
@@ -43,7 +102,12 @@ class LmdbDataset(Dataset):
             # in the LMDB
             num_entries = self.env.stat()["entries"]
 
-        self._keys = list(range(num_entries))
+        # keys encoded once here rather than on every access; files written before
+        # the switch to `_idx_key` have the ascii encoded indexes as keys
+        if num_entries == 0 or self.env.begin().get(_idx_key(0)) is not None:
+            self._keys = [_idx_key(i) for i in range(num_entries)]
+        else:
+            self._keys = [f"{i}".encode("ascii") for i in range(num_entries)]
         self.num_samples = num_entries
         
         #Get portion of total dataset
@@ -58,24 +122,57 @@ class LmdbDataset(Dataset):
             # limit each process to see a subset of data based off defined shard
             self.available_indices = self.shards[self.config.get("shard", 0)]
             self.num_samples = len(self.available_indices)
+            self._keys = [self._keys[i] for i in self.available_indices]
             
         #TODO
         self.transform = transform
 
+        # cached dataset properties, see `_get_property`
+        self._properties = {}
+
+        # read transaction reused by all samples read in this process, see `txn`
+        self._txn = None
+        self._pid = os.getpid()
+
+    def __getstate__(self):
+        # lmdb environments and transactions cannot be pickled, e.g. for DataLoader
+        # workers started with spawn; they are reopened in the worker
+        state = self.__dict__.copy()
+        state["env"] = None
+        state["_txn"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.env = self.connect_db(self.path)
+        self._pid = os.getpid()
+
+    @property
+    def txn(self):
+        """
+        A read transaction, opened once per process and reused across samples.
+
+        An environment inherited through fork must not be used in the child, so
+        forked DataLoader workers reopen it too.
+        """
+        if self._pid != os.getpid():
+            self.env = self.connect_db(self.path)
+            self._txn = None
+            self._pid = os.getpid()
+        if self._txn is None:
+            # buffers=True, the values are memoryviews into the map, not copies
+            self._txn = self.env.begin(buffers=True)
+        return self._txn
+
     def __len__(self):
         return self.num_samples
 
     def __getitem__(self, idx):
-        # if sharding, remap idx to appropriate idx of the sharded set
-        if self.sharded:
-            idx = self.available_indices[idx]
-
+        # if sharding, `_keys` only holds the keys of the sharded set
         #!CHECK, _keys should be less then total numbers of keys as there are more properties.
-        datapoint_pickled = self.env.begin().get(
-                f"{self._keys[idx]}".encode("ascii")
-            )
+        datapoint_pickled = self.txn.get(self._keys[idx])
         
-        data_object = pickle.loads(datapoint_pickled)
+        data_object = _decode(datapoint_pickled)
 
         #TODO
         if self.transform is not None:
@@ -89,7 +186,8 @@ class LmdbDataset(Dataset):
             subdir=False,
             readonly=True,
             lock=False,
-            readahead=True,
+            # turn off for datasets much larger than memory with random access
+            readahead=self.config.get("readahead", True),
             meminit=False,
             max_readers=1,
         )
@@ -100,25 +198,37 @@ class LmdbDataset(Dataset):
             for env in self.envs:
                 env.close()
         else:
+            if self._txn is not None:
+                self._txn.abort()
+                self._txn = None
             self.env.close()
 
     def get_metadata(self, num_samples=100):
         pass
 
+    def _get_property(self, key):
+        # properties are constant, read and unpickled once; `None` if not written,
+        # e.g. `species` in older files
+        if key not in self._properties:
+            value = self.env.begin().get(key.encode("ascii"))
+            self._properties[key] = None if value is None else pickle.loads(value)
+        return self._properties[key]
+
     @property
     def dtype(self):
-        dtype = self.env.begin().get("dtype".encode("ascii"))
-        return  pickle.loads(dtype)
+        return self._get_property("dtype")
             
     @property
     def feature_size(self):
-        feature_size = self.env.begin().get("feature_size".encode("ascii"))
-        return pickle.loads(feature_size)
+        return self._get_property("feature_size")
 
     @property
     def feature_name(self):
-        feature_name = self.env.begin().get("feature_name".encode("ascii"))
-        return pickle.loads(feature_name)
+        return self._get_property("feature_name")
+
+    @property
+    def species(self):
+        return self._get_property("species")
 
 
 
@@ -155,99 +265,197 @@ def CRNs2lmdb(CRNsDb, config):
         for i in range(config["num_workers"])
     ]
 
-    pool = mp.Pool(config["num_workers"])
+    # samples are randomly split over the workers; the workers only get the indices
+    # of their samples with each task, and the dataset once, when the pool starts
+    # (inherited without pickling under fork)
+    sizes = divide_to_list(len(CRNsDb), config["num_workers"])
+    indices = [
+        subset.indices for subset in random_split(range(len(CRNsDb)), sizes)
+    ]
 
-    dataset_chunked = random_split(CRNsDb, divide_to_list(len(CRNsDb), config["num_workers"]))
-    
-    
-    #total numbers of properties equal to 3+1 (length)
+    #total numbers of properties equal to 4+1 (length)
     meta_keys = {
                 "dtype" : CRNsDb.dtype,
                 "feature_size":CRNsDb.feature_size,
-                "feature_name":CRNsDb.feature_name
+                "feature_name":CRNsDb.feature_name,
+                # stored so that loading the lmdb file needs no scan for species
+                "species": getattr(CRNsDb, "species", None),
                 }
 
     mp_args = [
         (
             db_paths[i],
-            dataset_chunked[i],
+            indices[i],
             i,
-            meta_keys
+            meta_keys,
+            config.get("write_batch_size", WRITE_BATCH_SIZE),
+            config.get("compress", False),
         )
         for i in range(config["num_workers"])
     ]
 
-    # for key, value in meta_keys.items():
-    #     print(key,value)
-
     #Property should write to subset as well, as one may train them separately
-    #TODO imap faster?
-    pool.map(write_crns_to_lmdb, mp_args)
+    pool = mp.Pool(
+        config["num_workers"], initializer=_init_lmdb_writer, initargs=(CRNsDb,)
+    )
+    for _ in pool.imap_unordered(write_crns_to_lmdb, mp_args, chunksize=1):
+        pass
     pool.close()
+    pool.join()
 
     # Merge LMDB files
     merge_lmdbs(db_paths, config["out_path"], config["output_file"])
     cleanup_lmdb_files(config["out_path"], "_tmp_data*")
 
     
+# dataset the samples are read from in the writer processes
+_writer_dataset = None
+
+
+def _init_lmdb_writer(dataset):
+    global _writer_dataset
+    _writer_dataset = dataset
+
+
 def write_crns_to_lmdb(mp_args):
     #pid is idx of workers.
-    db_path, samples, pid, meta_keys = mp_args
+    db_path, samples, pid, meta_keys, batch_size, compress = mp_args
 
+    # map size estimated from the first samples, encoded here once and written in
+    # the loop below; the map grows if the estimate is exceeded, see `_put_batch`
+    head = [_encode(_writer_dataset[i], compress) for i in samples[:128]]
+    map_size = _estimate_map_size([len(b) for b in head], len(samples))
+
+    # only this worker writes to its temporary shard, so no lock is needed; a shard
+    # left by an earlier run is removed, as samples are appended to an empty file
+    _remove_lmdb(db_path)
     db = lmdb.open(
         db_path,
-        map_size=1099511627776 * 2,
+        map_size=map_size,
         subdir=False,
         meminit=False,
         map_async=True,
+        writemap=True,
+        sync=False,
+        metasync=False,
+        lock=False,
     )
 
     pbar = tqdm(
         total=len(samples),
         position=pid,
         desc=f"Worker {pid}: Writing CRNs Objects into LMDBs",
+        disable=not sys.stderr.isatty(),
+        mininterval=0.5,
     )
     
-    #write indexed samples
-    idx = 0
-    for sample in samples:
-        txn=db.begin(write=True)
-        txn.put(
-            f"{idx}".encode("ascii"),
-            pickle.dumps(sample, protocol=-1),
-        )
-        idx += 1
-        pbar.update(1)
-        txn.commit()
-        
+    #write indexed samples, committing once per batch rather than once per sample
+    batch = []
+    for idx, i in enumerate(samples):
+        value = head[idx] if idx < len(head) else _encode(_writer_dataset[i], compress)
+        batch.append((_idx_key(idx), value))
+        if len(batch) == batch_size:
+            _put_batch(db, batch, append=True)
+            pbar.update(len(batch))
+            batch = []
+    _put_batch(db, batch, append=True)
+    pbar.update(len(batch))
+    pbar.close()
+
     #write properties
-    txn=db.begin(write=True)
-    txn.put("length".encode("ascii"), pickle.dumps(len(samples), protocol=-1))
-    txn.commit()
-    
-    for key, value in meta_keys.items():
-        txn=db.begin(write=True)
-        txn.put(key.encode("ascii"), pickle.dumps(value, protocol=-1))
-        txn.commit()
+    properties = [("length", len(samples))] + list(meta_keys.items())
+    _put_batch(
+        db,
+        [(k.encode("ascii"), pickle.dumps(v, protocol=-1)) for k, v in properties],
+    )
     
-    db.sync()
+    db.sync(True)
     db.close()
 
 
+def _estimate_map_size(record_sizes, num_records):
+    """
+    Map size for `num_records` records, given the sizes of some of them, with room
+    for the lmdb overhead and the properties.
+    """
+    avg = sum(record_sizes) / max(len(record_sizes), 1)
+    return int(avg * num_records * 1.3) + 64 * 1024**2
+
+
+def _put_batch(env, batch, append=False):
+    """
+    Write (key, value) pairs in one transaction, doubling the map size of `env`
+    until they fit. With `append`, the keys must be sorted and come after all keys
+    in `env`; lmdb then skips the key search.
+    """
+    if not batch:
+        return
+    while True:
+        try:
+            with env.begin(write=True) as txn:
+                _, added = txn.cursor().putmulti(batch, append=append)
+                # lmdb does not raise on keys it refuses (e.g. an appended key that is
+                # not after the existing ones), it only leaves them out of the count
+                if added != len(batch):
+                    raise RuntimeError(
+                        "Only {} of {} records written to the lmdb file; with "
+                        "`append`, the file must not already hold these keys.".format(
+                            added, len(batch)
+                        )
+                    )
+            return
+        except lmdb.MapFullError:
+            env.set_mapsize(env.info()["map_size"] * 2)
+
+
+def _remove_lmdb(path):
+    """
+    Remove an lmdb file (opened with `subdir=False`) and its lock file, if they
+    exist, such that it is written from scratch.
+    """
+    for p in [str(path), str(path) + "-lock"]:
+        if os.path.exists(p):
+            os.remove(p)
+
+
 def merge_lmdbs(db_paths, out_path, output_file):
     """
     merge lmdb files and reordering indexes.
     """
+    # a single shard already has indexes 0..N-1 and its properties, copy it as is;
+    # the copy refuses to overwrite, so an existing output is removed first
+    if len(db_paths) == 1:
+        _remove_lmdb(os.path.join(out_path, output_file))
+        env_in = lmdb.open(
+            str(db_paths[0]),
+            subdir=False,
+            readonly=True,
+            lock=False,
+            meminit=False,
+        )
+        env_in.copy(os.path.join(out_path, output_file), compact=True)
+        env_in.close()
+        return
+
+    # no writemap here: it grows the file to the full map size on some platforms,
+    # and unlike the temporary shards this file is kept; the map size is that of
+    # the shards, grown if needed, see `_put_batch`. An existing output is replaced,
+    # as samples are appended to an empty file
+    _remove_lmdb(os.path.join(out_path, output_file))
     env_out = lmdb.open(
         os.path.join(out_path, output_file),
-        map_size=1099511627776 * 2,
+        map_size=sum(os.path.getsize(p) for p in db_paths) + 64 * 1024**2,
         subdir=False,
         meminit=False,
         map_async=True,
+        sync=False,
+        metasync=False,
+        lock=False,
     )
     
     
     idx = 0
+    properties = {}
     for db_path in db_paths:
         env_in = lmdb.open(
             str(db_path),
@@ -257,32 +465,28 @@ def merge_lmdbs(db_paths, out_path, output_file):
             readahead=True,
             meminit=False,
         )
-        
-        #should set indexes so that properties do not writtent down as well.
-        with env_out.begin(write=True) as txn_out, env_in.begin(write=False) as txn_in:
-            cursor = txn_in.cursor()
-            for key, value in cursor:
-                #write indexed samples
-                try:
-                    int(key.decode("ascii"))
-                    txn_out.put(
-                    f"{idx}".encode("ascii"),
-                    value,
-                    )
-                    idx+=1
-                    #print(idx)
-                #write properties
-                except ValueError:
-                    txn_out.put(
-                        key,
-                        value
-                    )
+
+        #samples are reindexed and written in batches, one transaction each; values
+        #are memoryviews into the shard, valid until its transaction ends, so they
+        #are passed on without copying
+        with env_in.begin(write=False, buffers=True) as txn_in:
+            batch = []
+            for key, value in txn_in.cursor().iternext(keys=True, values=True):
+                if not _is_idx_key(key):
+                    #properties are written once, after all samples
+                    properties[bytes(key)] = bytes(value)
+                    continue
+                batch.append((_idx_key(idx), value))
+                idx += 1
+                if len(batch) == MERGE_BATCH_SIZE:
+                    _put_batch(env_out, batch, append=True)
+                    batch = []
+            _put_batch(env_out, batch, append=True)
         env_in.close()
-    
-    #update length
-    txn_out=env_out.begin(write=True)
-    txn_out.put("length".encode("ascii"), pickle.dumps(idx, protocol=-1))
-    txn_out.commit()
-        
-    env_out.sync()
+
+    #write properties and update length
+    properties["length".encode("ascii")] = pickle.dumps(idx, protocol=-1)
+    _put_batch(env_out, list(properties.items()))
+
+    env_out.sync(True)
     env_out.close()
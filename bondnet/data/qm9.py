@@ -6,7 +6,6 @@ import pandas as pd
 import numpy as np
 import logging
 import warnings
-import itertools
 from collections import OrderedDict
 from rdkit import Chem
 from bondnet.data.dataset import MoleculeDataset
@@ -128,14 +127,14 @@ def create_edge_label_based_on_bond(
         if num_bonds < 1:
             warnings.warn("molecular has no bonds")
 
+        # mark the bonds in an adjacency matrix with one pass over the bonds, then
+        # read its upper triangle, which is row-major in the edge order above
         num_atoms = m.GetNumAtoms()
-        bond_label = []
-        for u, v in itertools.combinations(range(num_atoms), 2):
-            bond = m.GetBondBetweenAtoms(u, v)
-            if bond is not None:
-                bond_label.append(True)
-            else:
-                bond_label.append(False)
+        adjacency = np.zeros((num_atoms, num_atoms), dtype=bool)
+        for bond in m.GetBonds():
+            u, v = bond.GetBeginAtomIdx(), bond.GetEndAtomIdx()
+            adjacency[u, v] = adjacency[v, u] = True
+        bond_label = adjacency[np.triu_indices(num_atoms, k=1)].tolist()
 
         return bond_label
 
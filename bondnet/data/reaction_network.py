@@ -4,6 +4,26 @@ import dgl
 
 
 class ReactionInNetwork:
+    # there is one instance per reaction, slots avoid a per-instance __dict__
+    __slots__ = (
+        "_init_reactants",
+        "_reactants",
+        "_init_products",
+        "_products",
+        "len_products",
+        "len_reactants",
+        "extra_info",
+        "atom_mapping",
+        "bond_mapping",
+        "total_atoms",
+        "num_atoms_total",
+        "num_bonds_total",
+        "id",
+        "total_bonds",
+        "_atom_mapping_list",
+        "_bond_mapping_list",
+    )
+
     def __init__(
         self, reactants, products, 
         atom_mapping=None, 
@@ -65,6 +85,13 @@ class ReactionInNetwork:
         self._atom_mapping_list = None
         self._bond_mapping_list = None
 
+    def __setstate__(self, state):
+        # objects pickled before `__slots__` was added store their state as a dict
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **state[1]}
+        for k, v in state.items():
+            setattr(self, k, v)
+
     @property
     def init_reactants(self):
         return self._init_reactants
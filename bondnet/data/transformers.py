@@ -1,5 +1,4 @@
 import logging
-from collections import defaultdict
 import numpy as np
 import torch
 import dgl
@@ -35,6 +34,29 @@ def _transform(X, copy, with_mean=True, with_std=True, threshold=1.0e-3):
     return rst, mean, std
 
 
+def _mean_std(X, threshold=1.0e-3):
+    """
+    Compute the column mean and std of a 2D tensor, in float64.
+
+    Args:
+        X: 2D tensor
+    Returns:
+        mean: 1D tensor (float64)
+        std: 1D tensor (float64), population std as used by sklearn
+    """
+    X = X.double()
+    mean = X.mean(dim=0)
+    std = X.std(dim=0, unbiased=False)
+    for i, v in enumerate(std):
+        if v <= threshold:
+            logger.warning(
+                "Standard deviation for feature {} is {}, smaller than {}. "
+                "You may want to exclude this feature.".format(i, v, threshold)
+            )
+
+    return mean, std
+
+
 class StandardScaler:
     """
     Standardize features using `sklearn.preprocessing.StandardScaler`.
@@ -193,42 +215,47 @@ class HeteroGraphFeatureStandardScaler:
         return self._std
 
     def __call__(self, graphs) -> List[dgl.DGLGraph]:
+        # any iterable of graphs, e.g. a chain over the graphs of reactions
+        graphs = graphs if isinstance(graphs, list) else list(graphs)
         g = graphs[0]
         node_types = g.ntypes
-        node_feats = defaultdict(list)
-        node_feats_size = defaultdict(list)
-
-        # obtain feats from graphs
-        for g in graphs:
-            for nt in node_types:
-                data = g.nodes[nt].data["feat"]
-                node_feats[nt].append(data)
-                node_feats_size[nt].append(len(data))
-
-        dtype = node_feats[node_types[0]][0].dtype
+        dtype = g.nodes[node_types[0]].data["feat"].dtype
+        # graphs may already be on the training device, the features are then scaled
+        # there and the statistics are kept on cpu
+        device = g.device
+
+        # features of each node type in a single tensor, such that statistics and
+        # scaling are one reduction and one elementwise op, not one per graph
+        feats = {}
+        sizes = {}
+        for nt in node_types:
+            ft = [g.nodes[nt].data["feat"] for g in graphs]
+            feats[nt] = torch.cat(ft)
+            sizes[nt] = [len(x) for x in ft]
 
         # standardize
         if self._mean is not None and self._std is not None:
-            for nt in node_types:
-                feats = (torch.cat(node_feats[nt]) - self._mean[nt]) / self._std[nt]
-                node_feats[nt] = feats
+            scale = self._std
 
         else:
             self._std = {}
             self._mean = {}
+            scale = {}
 
             for nt in node_types:
-                feats, mean, std = _transform(torch.cat(node_feats[nt]), self.copy)
-                node_feats[nt] = torch.tensor(feats, dtype=dtype)
-                mean = torch.tensor(mean, dtype=dtype)
-                std = torch.tensor(std, dtype=dtype)
-                self._mean[nt] = mean
-                self._std[nt] = std
-
-        # assign data back
+                mean, std = _mean_std(feats[nt])
+                self._mean[nt] = mean.to(dtype).cpu()
+                self._std[nt] = std.to(dtype).cpu()
+                # same as sklearn, features of zero variance are only centered
+                eps = 10 * torch.finfo(torch.float64).eps
+                scale[nt] = torch.where(std < eps, torch.ones_like(std), std).to(dtype)
+
+        # assign data back, as views into the scaled tensor of each node type; the
+        # concatenated tensor is a new one, so it is scaled in place
         for nt in node_types:
-            feats = torch.split(node_feats[nt], node_feats_size[nt])
-            for g, ft in zip(graphs, feats):
+            mean = self._mean[nt].to(device)
+            scaled = feats[nt].sub_(mean).div_(scale[nt].to(device))
+            for g, ft in zip(graphs, torch.split(scaled, sizes[nt])):
                 g.nodes[nt].data["feat"] = ft
 
         return graphs
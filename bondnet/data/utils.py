@@ -6,26 +6,68 @@ import torch
 from rdkit import Chem
 from collections import deque
 import itertools, copy, dgl
+import multiprocessing
 
 
-def get_dataset_species(molecules):
+# atomic numbers go up to 118, index 0 is the dummy atom
+_NUM_ELEMENTS = 119
+
+
+def species_mask_of_mol(mol):
+    """
+    Boolean mask over atomic numbers, `True` for the ones appearing in the molecule.
+    All `False` if `mol` is `None`.
+    """
+    mask = np.zeros(_NUM_ELEMENTS, dtype=bool)
+    if mol is not None:
+        z = np.fromiter(
+            (a.GetAtomicNum() for a in mol.GetAtoms()),
+            dtype=np.int64,
+            count=mol.GetNumAtoms(),
+        )
+        mask[z] = True
+    return mask
+
+
+def species_from_mask(mask):
+    """
+    Sorted species strings of the atomic numbers set in a mask given by
+    `species_mask_of_mol` (or the union of several).
+    """
+    pt = Chem.GetPeriodicTable()
+    return sorted(pt.GetElementSymbol(int(z)) for z in np.flatnonzero(mask))
+
+
+def _union_species_masks(masks):
+    rst = species_mask_of_mol(None)
+    for m in masks:
+        rst |= m
+    return rst
+
+
+def get_dataset_species(molecules, num_workers=1, chunksize=256):
     """
     Get all the species of atoms appearing in the the molecules.
 
     Args:
         molecules (list): rdkit molecules
+        num_workers (int): number of processes to scan the molecules with. The
+            molecules are scanned serially if `1` or if there are too few of them to
+            be worth sending to the workers.
+        chunksize (int): number of molecules sent to a worker at a time
 
     Returns:
         list: a sequence of species string
     """
-    system_species = set()
-    for mol in molecules:
-        if mol is None:
-            continue
-        species = [a.GetSymbol() for a in mol.GetAtoms()]
-        system_species.update(species)
+    if num_workers <= 1 or len(molecules) < 2 * chunksize:
+        per_mol_species = map(species_mask_of_mol, molecules)
+        return species_from_mask(_union_species_masks(per_mol_species))
 
-    return sorted(system_species)
+    with multiprocessing.Pool(num_workers) as pool:
+        per_mol_species = pool.imap_unordered(
+            species_mask_of_mol, molecules, chunksize=chunksize
+        )
+        return species_from_mask(_union_species_masks(per_mol_species))
 
 
 def get_dataset_species_from_json(json_file):
@@ -81,7 +123,7 @@ def one_hot_encoding(x, allowable_set):
         List of int (0 or 1) where at most one value is 1.
         If the i-th value is 1, then we must have x == allowable_set[i].
     """
-    return list(map(int, list(map(lambda s: x == s, allowable_set))))
+    return [int(x == s) for s in allowable_set]
 
 
 def multi_hot_encoding(x, allowable_set):
@@ -121,6 +163,26 @@ def h_count_and_degree(atom_ind, bond_list, species_order):
     return h_count, int(len(atom_bonds))
 
 
+def h_count_and_degree_full(atom_num, bond_list, species_order):
+    """
+    gets the number of H-atoms connected to each atom + degree of bonding, counted in
+    a single pass over the bonds instead of one pass per atom
+    takes:
+        atom_num(int): number of atoms in molecule
+        bond_list(list of lists): list of bonds in graph
+        species_order: order of atoms in graph to match nodes
+    returns:
+        h_count(list of int), degree(list of int): both of size atom_num
+    """
+    bonds = np.asarray(bond_list, dtype=np.int64).reshape(-1, 2)
+    is_h = np.asarray([s == "H" for s in species_order], dtype=np.int64)
+    degree = np.bincount(bonds.ravel(), minlength=atom_num)
+    h_count = np.bincount(
+        bonds[:, 0], weights=is_h[bonds[:, 1]], minlength=atom_num
+    ) + np.bincount(bonds[:, 1], weights=is_h[bonds[:, 0]], minlength=atom_num)
+    return h_count.astype(np.int64).tolist(), degree.tolist()
+
+
 def ring_features_from_atom(atom_ind, cycles, allowed_ring_size):
     """
     returns an atom's ring inclusion and ring size features
@@ -385,6 +447,28 @@ def _split_batched_output(graph, value):
     return torch.split(value, nbonds)
 
 
+def get_has_bonds(bond_mapping):
+    """
+    Whether each reactant and product of a reaction has bonds.
+
+    Args:
+        bond_mapping (list): [reactants bond mappings, products bond mappings], each
+            a list of dict, one for each molecule
+
+    Returns:
+        dict: with keys `reactants` and `products`, and 1D boolean arrays as values
+    """
+    reactants, products = bond_mapping[0], bond_mapping[1]
+    return {
+        "reactants": np.fromiter(
+            (bool(mp) for mp in reactants), dtype=bool, count=len(reactants)
+        ),
+        "products": np.fromiter(
+            (bool(mp) for mp in products), dtype=bool, count=len(products)
+        ),
+    }
+
+
 def mol_graph_to_rxn_graph(graph, feats, reactions, device=None, reverse=False):
     """
     Convert a batched molecule graph to a batched reaction graph.
@@ -424,10 +508,7 @@ def mol_graph_to_rxn_graph(graph, feats, reactions, device=None, reverse=False):
             "num_bonds_total": rxn.num_bonds_total,
             "num_atoms_total": rxn.num_atoms_total,
         }
-        has_bonds = {
-            "reactants": [True if len(mp) > 0 else False for mp in rxn.bond_mapping[0]],
-            "products": [True if len(mp) > 0 else False for mp in rxn.bond_mapping[1]],
-        }
+        has_bonds = get_has_bonds(rxn.bond_mapping)
         if len(has_bonds["reactants"]) != len(reactants) or len(
             has_bonds["products"]
         ) != len(products):
@@ -79,11 +79,12 @@ def evaluate_breakdown(model, nodes, data_loader, device=None):
             reaction_types = label["reaction_types"]
 
             if device is not None:
-                feats = {k: v.to(device) for k, v in feats.items()}
-                target = target.to(device)
+                # asynchronous if the loader is created with `pin_memory=True`
+                feats = {k: v.to(device, non_blocking=True) for k, v in feats.items()}
+                target = target.to(device, non_blocking=True)
                 # norm_atom = norm_atom.to(device)
                 # norm_bond = norm_bond.to(device)
-                stdev = stdev.to(device)
+                stdev = stdev.to(device, non_blocking=True)
 
             pred = model(
                 batched_graph,
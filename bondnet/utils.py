@@ -23,6 +23,8 @@ from pathlib import Path
 import numpy as np
 from typing import List, Any
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import networkx as nx
 
 
@@ -273,12 +275,104 @@ def yaml_dump(obj, filename):
         yaml.dump(obj, f, default_flow_style=False)
 
 
-def yaml_load(filename):
-    with open(to_path(filename), "r") as f:
-        obj = yaml.safe_load(f)
+# use the libyaml based loader when available, it is much faster than the pure python
+# one on large label and feature files
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _yaml_cache_file(filename):
+    return filename.with_name(filename.name + ".pkl")
+
+
+def _yaml_cache_key(filename):
+    st = filename.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+def _read_yaml_cache(filename, header_only=False):
+    """
+    Read the pickle cache of a yaml file.
+
+    The cache holds the size and modification time of the yaml file it was made
+    from, followed by the parsed object.
+
+    Returns:
+        tuple: (fresh, obj), where `fresh` tells whether the cache exists and matches
+        the current yaml file, and `obj` is the cached object (`None` if not fresh or
+        `header_only`)
+    """
+    try:
+        with open(_yaml_cache_file(filename), "rb") as f:
+            if pickle.load(f) != _yaml_cache_key(filename):
+                return False, None
+            return True, None if header_only else pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return False, None
+
+
+def _yaml_cache_is_fresh(filename):
+    return _read_yaml_cache(filename, header_only=True)[0]
+
+
+def yaml_load(filename, cache=False):
+    """
+    Load a yaml file.
+
+    Args:
+        filename (str or Path): path to the yaml file
+        cache (bool): if `True`, the parsed object is pickled next to the yaml file
+            (`<filename>.pkl`) and later loads read the pickle instead, as long as the
+            size and modification time of the yaml file are those it was made from.
+    """
+    filename = to_path(filename)
+    if cache:
+        fresh, obj = _read_yaml_cache(filename)
+        if fresh:
+            return obj
+
+    key = _yaml_cache_key(filename)
+    with open(filename, "r") as f:
+        obj = yaml.load(f, Loader=_YamlLoader)
+
+    if cache:
+        # the cache only saves time, failing to write it (e.g. a read-only data
+        # directory) should not fail the load
+        try:
+            with open(_yaml_cache_file(filename), "wb") as f:
+                pickle.dump(key, f)
+                pickle.dump(obj, f)
+        except OSError as e:
+            logger.warning(f"Failed to write yaml cache for {filename}: {e}")
+
     return obj
 
 
+def yaml_load_parallel(filenames, cache=False):
+    """
+    Load several yaml files, parsing them in separate processes.
+
+    Files with a valid pickle cache (see `yaml_load`) are read in this process, as
+    there is no parsing left to spread.
+
+    Args:
+        filenames (list): paths to the yaml files
+        cache (bool): see `yaml_load`
+
+    Returns:
+        list: the loaded objects, in the order of `filenames`
+    """
+    filenames = [to_path(f) for f in filenames]
+    to_parse = [f for f in filenames if not (cache and _yaml_cache_is_fresh(f))]
+    if len(to_parse) < 2:
+        return [yaml_load(f, cache=cache) for f in filenames]
+
+    with ProcessPoolExecutor(max_workers=len(to_parse)) as executor:
+        parsed = dict(
+            zip(to_parse, executor.map(partial(yaml_load, cache=cache), to_parse))
+        )
+    return [parsed[f] if f in parsed else yaml_load(f, cache=cache) for f in filenames]
+
+
 def stat_cuda(msg):
     print("-" * 10, "cuda status:", msg, "-" * 10)
     print(
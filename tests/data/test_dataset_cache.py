@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+import torch
+import dgl
+from pathlib import Path
+from rdkit import Chem
+from bondnet.data.dataset import (
+    MoleculeDataset,
+    ReactionNetworkDatasetPrecomputed,
+    _grapher_signature,
+)
+from bondnet.data.grapher import BaseGraph
+from bondnet.data.featurizer import RBF
+from bondnet.model.training_utils import get_grapher
+
+
+test_files = Path(__file__).parent.joinpath("testdata")
+
+
+class AtomicNumberGraph(BaseGraph):
+    """
+    Homo graph of the atoms of a rdkit molecule, featurized with atomic number and
+    degree; counts the graphs it builds.
+    """
+
+    num_built = 0
+
+    def build_graph(self, mol):
+        AtomicNumberGraph.num_built += 1
+        bonds = [(b.GetBeginAtomIdx(), b.GetEndAtomIdx()) for b in mol.GetBonds()]
+        src = [u for u, v in bonds] + [v for u, v in bonds]
+        dst = [v for u, v in bonds] + [u for u, v in bonds]
+        return dgl.graph((src, dst), num_nodes=mol.GetNumAtoms())
+
+    def featurize(self, g, mol, ret_feat_names=False, **kwargs):
+        g.ndata["feat"] = torch.tensor(
+            [[a.GetAtomicNum(), a.GetDegree()] for a in mol.GetAtoms()],
+            dtype=torch.float32,
+        )
+        return g
+
+    @property
+    def feature_size(self):
+        return {"atom": 2}
+
+    @property
+    def feature_name(self):
+        return {"atom": ["atomic number", "degree"]}
+
+
+def test_molecule_dataset_graph_cache(tmp_path):
+    sdf = tmp_path.joinpath("mols.sdf")
+    writer = Chem.SDWriter(str(sdf))
+    for smi in ["C", "CO", "C=O", "CCO"]:
+        writer.write(Chem.AddHs(Chem.MolFromSmiles(smi)))
+    writer.close()
+    labels = tmp_path.joinpath("labels.csv")
+    pd.DataFrame({"atomization_energy": [1.0, 2.0, 3.0, 5.0]}).to_csv(labels)
+
+    def make_dataset(cache_graphs):
+        return MoleculeDataset(
+            grapher=AtomicNumberGraph(self_loop=False),
+            molecules=sdf,
+            labels=labels,
+            unit_conversion=False,
+            cache_graphs=cache_graphs,
+        )
+
+    ref = make_dataset(False)
+    make_dataset(True)  # build and save the cache
+    num_built = AtomicNumberGraph.num_built
+    dataset = make_dataset(True)
+    # loaded from the cache, no graph is built
+    assert AtomicNumberGraph.num_built == num_built
+    assert tmp_path.joinpath("mols.graphs.pt").exists()
+
+    assert len(dataset) == len(ref) == 4
+    assert dataset.feature_size == ref.feature_size
+    assert dataset.species == ref.species
+    for (g, lb), (g_ref, lb_ref) in zip(dataset, ref):
+        assert g.graph_id == g_ref.graph_id
+        assert torch.equal(g.ndata["feat"], g_ref.ndata["feat"])
+        for x, y in zip(g.edges(), g_ref.edges()):
+            assert torch.equal(x, y)
+        assert lb.keys() == lb_ref.keys()
+        for k in lb:
+            assert np.allclose(lb[k], lb_ref[k])
+
+
+def test_grapher_signature():
+    def signature(**kwargs):
+        grapher = AtomicNumberGraph(atom_featurizer=RBF(num_centers=2000), **kwargs)
+        return _grapher_signature(grapher)
+
+    # the same config, also with featurizers that are other objects
+    assert signature() == signature()
+    assert signature() != signature(self_loop=True)
+
+    # a value in the middle of an array that numpy truncates in the repr
+    grapher = AtomicNumberGraph(atom_featurizer=RBF(num_centers=2000))
+    grapher.atom_featurizer.centers[1000] += 1e-3
+    assert _grapher_signature(grapher) != signature()
+
+
+def test_precomputed_dataset_cache(tmp_path):
+    def make_dataset(cache_path):
+        return ReactionNetworkDatasetPrecomputed(
+            grapher=get_grapher([]),
+            file=str(test_files.joinpath("barrier_100.json")),
+            target="dG_barrier",
+            classifier=False,
+            classif_categories=3,
+            filter_species=[3, 6],
+            filter_outliers=False,
+            filter_sparse_rxns=False,
+            debug=False,
+            extra_keys=[],
+            extra_info=[],
+            cache_path=cache_path,
+        )
+
+    cache_path = tmp_path.joinpath("reactions.pt")
+    ref = make_dataset(None)
+    make_dataset(cache_path)  # build and save the cache
+    assert cache_path.exists()
+    dataset = make_dataset(cache_path)
+    # loaded from the cache, the molecules are not read
+    assert dataset.molecules is None
+
+    assert len(dataset) == len(ref) > 0
+    assert dataset.feature_size == ref.feature_size
+    assert dataset.feature_name == ref.feature_name
+    for (g, feats, lb), (g_ref, feats_ref, lb_ref) in zip(dataset, ref):
+        assert g.canonical_etypes == g_ref.canonical_etypes
+        for nt in g_ref.ntypes:
+            assert g.number_of_nodes(nt) == g_ref.number_of_nodes(nt)
+            for k, v in g_ref.nodes[nt].data.items():
+                assert torch.equal(g.nodes[nt].data[k], v)
+            assert torch.equal(feats[nt], feats_ref[nt])
+        for et in g_ref.canonical_etypes:
+            for x, y in zip(g.edges(etype=et), g_ref.edges(etype=et)):
+                assert torch.equal(x, y)
+
+        assert lb.keys() == lb_ref.keys()
+        for k, v in lb_ref.items():
+            if isinstance(v, torch.Tensor):
+                assert torch.equal(lb[k], v)
+            else:
+                assert lb[k] == v
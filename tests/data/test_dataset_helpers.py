@@ -0,0 +1,59 @@
+import numpy as np
+import torch
+from bondnet.data.dataset import (
+    train_validation_test_split,
+    _one_hot_classes,
+    _graph_to_payload,
+    _graph_from_payload,
+)
+from bondnet.test_utils import make_hetero_CH2O, make_homo_CH2O
+
+
+def test_train_validation_test_split_seed():
+    class Data:
+        dtype = "float32"
+
+        def __len__(self):
+            return 20
+
+    # same splits as the legacy np.random.seed() + np.random.permutation()
+    np.random.seed(35)
+    ref = np.random.permutation(20)
+
+    np.random.seed(0)
+    state = np.random.get_state()[1].copy()
+    train, val, test = train_validation_test_split(Data(), 0.2, 0.1, random_seed=35)
+    assert list(train.indices) == list(ref[:14])
+    assert list(val.indices) == list(ref[14:18])
+    assert list(test.indices) == list(ref[18:])
+
+    # and the global random state is left alone
+    assert np.array_equal(np.random.get_state()[1], state)
+
+
+def test_one_hot_classes():
+    # as the original per-reaction loop: the reverse class is marked in the forward
+    # tensor and the reverse tensor is all zero
+    values, values_rev = _one_hot_classes([0, 2, 1], [1, None, 1], 3)
+    assert np.array_equal(values, [[1, 1, 0], [0, 0, 1], [0, 1, 0]])
+    assert np.array_equal(values_rev[0], [0, 0, 0])
+    assert values_rev[1] is None
+    assert np.array_equal(values_rev[2], [0, 0, 0])
+
+
+def test_graph_payload_round_trip():
+    for g, _ in [make_hetero_CH2O(self_loop=True), make_homo_CH2O()]:
+        g.mol_name = "CH2O"
+        g2 = _graph_from_payload(_graph_to_payload(g))
+
+        assert g2.mol_name == "CH2O"
+        assert g2.canonical_etypes == g.canonical_etypes
+        for nt in g.ntypes:
+            assert g2.number_of_nodes(nt) == g.number_of_nodes(nt)
+            for k, v in g.nodes[nt].data.items():
+                assert torch.equal(g2.nodes[nt].data[k], v)
+        for et in g.canonical_etypes:
+            for x, y in zip(g2.edges(etype=et), g.edges(etype=et)):
+                assert torch.equal(x, y)
+            for k, v in g.edges[et].data.items():
+                assert torch.equal(g2.edges[et].data[k], v)
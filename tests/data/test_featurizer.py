@@ -1,5 +1,7 @@
 import numpy as np
 import pandas as pd
+from types import SimpleNamespace
+import torch
 from bondnet.data.featurizer import (
     BondAsNodeGraphFeaturizerGeneral,
     AtomFeaturizerGraphGeneral,
@@ -9,7 +11,11 @@ from bondnet.data.featurizer import (
 )
 from bondnet.dataset.generalized import create_reaction_network_files_and_valid_rows
 from bondnet.model.training_utils import get_grapher
-from bondnet.data.utils import get_dataset_species
+from bondnet.data.utils import (
+    get_dataset_species,
+    h_count_and_degree,
+    h_count_and_degree_full,
+)
 
 
 def get_data(
@@ -107,3 +113,110 @@ def test_extra_bond_featurizer():
             assert len(v[0]) == 7
 
 
+def make_mol_wrappers():
+    """
+    Two molecule wrappers with known features:
+
+    CH2O: C (0) bonded to O (1) and to H (2) and H (3).
+
+    A C3 ring (0, 1, 2) with Li (3) bonded to C (2) and H (4) bonded to C (0); the
+    non-metal bonds are given as lists, as done when reading the reaction files.
+    """
+    ch2o = SimpleNamespace(
+        species=["C", "O", "H", "H"],
+        coords=[[0.0, 0.0, 0.0], [0.0, 0.0, 2.0], [3.0, 0.0, 0.0], [0.0, 4.0, 0.0]],
+        bonds={(0, 1): None, (0, 2): None, (0, 3): None},
+        nonmetal_bonds=[(0, 1), (0, 2), (0, 3)],
+        num_atoms=4,
+        atom_features={"esp_total": [0.5, 1.5, 2.5, 3.5]},
+        bond_features={"bond_esp_total": [0.25, 0.5, 0.75]},
+    )
+    ring = SimpleNamespace(
+        species=["C", "C", "C", "Li", "H"],
+        coords=[
+            [0.0, 0.0, 0.0],
+            [3.0, 0.0, 0.0],
+            [0.0, 4.0, 0.0],
+            [0.0, 4.0, 2.0],
+            [0.0, 0.0, -1.0],
+        ],
+        bonds={(0, 1): None, (1, 2): None, (0, 2): None, (2, 3): None, (0, 4): None},
+        nonmetal_bonds=[[0, 1], [1, 2], [0, 2], [0, 4]],
+        num_atoms=5,
+        atom_features={"esp_total": [1.0, 2.0, 3.0, 4.0, 5.0]},
+        bond_features={"bond_esp_total": [1.0, 2.0, 3.0, 4.0, 5.0]},
+    )
+    return ch2o, ring
+
+
+def test_h_count_and_degree_full():
+    for mol in make_mol_wrappers():
+        bonds = [list(b) for b in mol.bonds]
+        ref = [
+            h_count_and_degree(i, bonds, mol.species) for i in range(mol.num_atoms)
+        ]
+        h_count, degree = h_count_and_degree_full(mol.num_atoms, bonds, mol.species)
+        assert h_count == [h for h, _ in ref]
+        assert degree == [d for _, d in ref]
+
+
+def test_atom_featurizer_known_values():
+    ch2o, ring = make_mol_wrappers()
+    featurizer = AtomFeaturizerGraphGeneral(selected_keys=["esp_total"])
+    # sorted to C, H, Li, O
+    species = ["O", "H", "C", "Li"]
+
+    # total degree, is in ring, total H, esp_total, one hot C H Li O, ring size 3-7
+    ref = [
+        [3, 0, 2, 0.5, 1, 0, 0, 0, 0, 0, 0, 0, 0],
+        [1, 0, 0, 1.5, 0, 0, 0, 1, 0, 0, 0, 0, 0],
+        [1, 0, 0, 2.5, 0, 1, 0, 0, 0, 0, 0, 0, 0],
+        [1, 0, 0, 3.5, 0, 1, 0, 0, 0, 0, 0, 0, 0],
+    ]
+    feats, names = featurizer(ch2o, dataset_species=species)
+    assert feats["feat"].dtype == torch.float32
+    assert np.array_equal(feats["feat"], ref)
+    assert len(names) == featurizer.feature_size == 13
+
+    ref = [
+        [3, 1, 1, 1.0, 1, 0, 0, 0, 1, 0, 0, 0, 0],
+        [2, 1, 0, 2.0, 1, 0, 0, 0, 1, 0, 0, 0, 0],
+        [3, 1, 0, 3.0, 1, 0, 0, 0, 1, 0, 0, 0, 0],
+        [1, 0, 0, 4.0, 0, 0, 1, 0, 0, 0, 0, 0, 0],
+        [1, 0, 0, 5.0, 0, 1, 0, 0, 0, 0, 0, 0, 0],
+    ]
+    feats, _ = featurizer(ring, dataset_species=species)
+    assert np.array_equal(feats["feat"], ref)
+
+    # species not in the dataset species are all zeros in the one hot encoding
+    feats, _ = featurizer(ring, dataset_species=["C", "H"])
+    assert np.array_equal(feats["feat"][3, 4:6], [0, 0])
+
+
+def test_bond_featurizer_known_values():
+    ch2o, ring = make_mol_wrappers()
+    featurizer = BondAsNodeGraphFeaturizerGeneral(
+        selected_keys=["bond_esp_total", "bond_length"]
+    )
+
+    # metal bond, ring inclusion, ring size 3-7, bond_esp_total, bond length
+    ref = [
+        [1, 0, 0, 0, 0, 0, 0, 0.25, 2.0],
+        [1, 0, 0, 0, 0, 0, 0, 0.5, 3.0],
+        [1, 0, 0, 0, 0, 0, 0, 0.75, 4.0],
+    ]
+    feats, names = featurizer(ch2o)
+    assert feats["feat"].dtype == torch.float32
+    assert np.allclose(feats["feat"], ref)
+    assert len(names) == featurizer.feature_size == 9
+
+    # bonds of the ring are found in the ring of size 3
+    ref = [
+        [0, 1, 1, 0, 0, 0, 0, 1.0, 3.0],
+        [0, 1, 1, 0, 0, 0, 0, 2.0, 5.0],
+        [0, 1, 1, 0, 0, 0, 0, 3.0, 4.0],
+        [0, 0, 0, 0, 0, 0, 0, 4.0, 2.0],
+        [0, 0, 0, 0, 0, 0, 0, 5.0, 1.0],
+    ]
+    feats, _ = featurizer(ring)
+    assert np.allclose(feats["feat"], ref)
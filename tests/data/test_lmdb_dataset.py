@@ -0,0 +1,88 @@
+import torch
+from torch.utils.data import random_split
+from bondnet.data.lmdb_dataset import (
+    LmdbDataset,
+    CRNs2lmdb,
+    merge_lmdbs,
+    write_crns_to_lmdb,
+    _init_lmdb_writer,
+)
+
+
+meta_keys = {
+    "dtype": "float32",
+    "feature_size": {"atom": 3},
+    "feature_name": {"atom": ["a", "b", "c"]},
+    "species": ["C", "H"],
+}
+
+
+def write_shards(directory, datasets):
+    """
+    Write each dataset (a list of samples) to a shard, as the workers of `CRNs2lmdb`.
+    """
+    db_paths = []
+    for i, data in enumerate(datasets):
+        path = str(directory.joinpath("_tmp_data.%04d.lmdb" % i))
+        _init_lmdb_writer(data)
+        write_crns_to_lmdb((path, range(len(data)), i, meta_keys, 2, False))
+        db_paths.append(path)
+    return db_paths
+
+
+def read_lmdb(path):
+    dataset = LmdbDataset({"src": str(path)})
+    samples = [dataset[i] for i in range(len(dataset))]
+    species = dataset.species
+    dataset.close_db()
+    return samples, species
+
+
+def test_merge_lmdbs_into_existing_file(tmp_path):
+    first = [{"id": i} for i in range(7)]
+    db_paths = write_shards(tmp_path, [first[:4], first[4:]])
+    merge_lmdbs(db_paths, str(tmp_path), "a.lmdb")
+    samples, species = read_lmdb(tmp_path.joinpath("a.lmdb"))
+    assert samples == first
+    assert species == meta_keys["species"]
+
+    # rerun with fewer samples into the same shard and output files, nothing of the
+    # first run is left
+    second = [{"id": -i} for i in range(3)]
+    db_paths = write_shards(tmp_path, [second[:2], second[2:]])
+    merge_lmdbs(db_paths, str(tmp_path), "a.lmdb")
+    samples, _ = read_lmdb(tmp_path.joinpath("a.lmdb"))
+    assert samples == second
+
+
+def test_merge_single_lmdb_into_existing_file(tmp_path):
+    first = [{"id": i} for i in range(5)]
+    merge_lmdbs(write_shards(tmp_path, [first]), str(tmp_path), "a.lmdb")
+    samples, species = read_lmdb(tmp_path.joinpath("a.lmdb"))
+    assert samples == first
+    assert species == meta_keys["species"]
+
+    second = [{"id": -i} for i in range(3)]
+    merge_lmdbs(write_shards(tmp_path, [second]), str(tmp_path), "a.lmdb")
+    samples, _ = read_lmdb(tmp_path.joinpath("a.lmdb"))
+    assert samples == second
+
+
+def test_crns2lmdb_shuffles_samples(tmp_path):
+    class Data(list):
+        dtype = meta_keys["dtype"]
+        feature_size = meta_keys["feature_size"]
+        feature_name = meta_keys["feature_name"]
+        species = meta_keys["species"]
+
+    data = Data({"id": i} for i in range(10))
+    config = {"out_path": str(tmp_path), "output_file": "a.lmdb", "num_workers": 3}
+
+    # samples are split over the workers as by random_split
+    torch.manual_seed(0)
+    ref = [data[i] for s in random_split(range(len(data)), [4, 3, 3]) for i in s]
+    torch.manual_seed(0)
+    CRNs2lmdb(data, config)
+    samples, species = read_lmdb(tmp_path.joinpath("a.lmdb"))
+    assert samples == ref
+    assert species == meta_keys["species"]
@@ -4,9 +4,11 @@ from bondnet.data.transformers import (
     StandardScaler,
     HomoGraphFeatureStandardScaler,
     HeteroGraphFeatureStandardScaler,
+    _mean_std,
 )
 import torch
-from bondnet.test_utils import make_homo_CH2O, make_hetero_CH2O
+from sklearn.preprocessing import StandardScaler as sk_StandardScaler
+from bondnet.test_utils import make_homo_CH2O, make_hetero_CH2O, make_hetero_CHO
 
 
 def test_standard_scaler():
@@ -21,6 +23,13 @@ def test_standard_scaler():
     assert np.allclose(scaler.std, std)
 
 
+def test_mean_std():
+    a = np.random.rand(10, 3)
+    mean, std = _mean_std(torch.as_tensor(a, dtype=torch.float32))
+    assert np.allclose(mean, np.mean(a, axis=0))
+    assert np.allclose(std, np.std(a, axis=0))
+
+
 def test_standard_scaler_hetero_graph():
     g1, feats1 = make_hetero_CH2O()
     g2, feats2 = make_hetero_CH2O()
@@ -49,6 +58,43 @@ def test_standard_scaler_hetero_graph():
         assert np.allclose(ref_feats[nt], ft)
 
 
+def test_standard_scaler_hetero_graph_against_sklearn():
+    def make_graphs(seed):
+        rng = np.random.RandomState(seed)
+        graphs = [make_hetero_CH2O()[0], make_hetero_CHO()[0], make_hetero_CH2O()[0]]
+        feats = defaultdict(list)
+        for g in graphs:
+            for nt in g.ntypes:
+                ft = rng.rand(g.number_of_nodes(nt), 3)
+                # a constant column, which sklearn only centers
+                ft[:, 1] = 2.0
+                g.nodes[nt].data["feat"] = torch.as_tensor(ft, dtype=torch.float32)
+                feats[nt].append(ft.astype(np.float32))
+        return graphs, {nt: np.concatenate(ft) for nt, ft in feats.items()}
+
+    graphs, ref_feats = make_graphs(0)
+    scaler = HeteroGraphFeatureStandardScaler()
+    graphs = scaler(graphs)
+
+    sk_scalers = {}
+    for nt, ref in ref_feats.items():
+        sk_scalers[nt] = sk_StandardScaler().fit(ref)
+        ft = np.concatenate([g.nodes[nt].data["feat"] for g in graphs])
+        assert np.allclose(ft, sk_scalers[nt].transform(ref), atol=1e-5)
+        assert np.allclose(scaler.mean[nt], sk_scalers[nt].mean_)
+        assert np.allclose(scaler.std[nt], np.sqrt(sk_scalers[nt].var_))
+
+    # other graphs standardized with the fitted mean and std
+    graphs, ref_feats = make_graphs(1)
+    scaler = HeteroGraphFeatureStandardScaler(mean=scaler.mean, std=scaler.std)
+    graphs = scaler(graphs)
+    for nt, ref in ref_feats.items():
+        ft = np.concatenate([g.nodes[nt].data["feat"] for g in graphs])
+        expected = sk_scalers[nt].transform(ref)
+        # a given std is used as is, also when zero, compare the other columns
+        assert np.allclose(ft[:, [0, 2]], expected[:, [0, 2]], atol=1e-5)
+
+
 def test_standard_scaler_homo_graph():
     g1, feats1 = make_homo_CH2O()
     g2, feats2 = make_homo_CH2O()
@@ -0,0 +1,47 @@
+import os
+from bondnet.utils import yaml_dump, yaml_load, yaml_load_parallel
+
+
+def test_yaml_load_cache(tmp_path):
+    filename = tmp_path.joinpath("labels.yaml")
+    cache_file = tmp_path.joinpath("labels.yaml.pkl")
+
+    # miss: no cache yet, one is written
+    yaml_dump([{"value": 1.0}], filename)
+    st = filename.stat()
+    assert yaml_load(filename, cache=True) == [{"value": 1.0}]
+    assert cache_file.exists()
+
+    # hit: same size and modification time, the cache is read, not the yaml file
+    yaml_dump([{"value": 9.0}], filename)
+    os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert yaml_load(filename, cache=True) == [{"value": 1.0}]
+    assert yaml_load_parallel([filename, filename], cache=True) == [
+        {"value": 1.0},
+        {"value": 1.0},
+    ]
+
+    # miss: different modification time, although older than the cache
+    os.utime(filename, ns=(0, 0))
+    assert yaml_load(filename, cache=True) == [{"value": 9.0}]
+
+    # miss: different size, same modification time
+    yaml_dump([{"value": 2.0, "other": 3.0}], filename)
+    os.utime(filename, ns=(0, 0))
+    assert yaml_load(filename, cache=True) == [{"value": 2.0, "other": 3.0}]
+
+    # miss: an unreadable cache is rewritten
+    cache_file.write_bytes(b"")
+    assert yaml_load(filename, cache=True) == [{"value": 2.0, "other": 3.0}]
+    assert yaml_load(filename, cache=True) == [{"value": 2.0, "other": 3.0}]
+    assert cache_file.stat().st_size > 0
+
+
+def test_yaml_load_cache_write_failure(tmp_path):
+    filename = tmp_path.joinpath("labels.yaml")
+    yaml_dump([{"value": 1.0}], filename)
+
+    # the cache path is taken by a directory, it cannot be written
+    os.mkdir(tmp_path.joinpath("labels.yaml.pkl"))
+    assert yaml_load(filename, cache=True) == [{"value": 1.0}]
+    assert yaml_load(filename, cache=True) == [{"value": 1.0}]